@@ -1,12 +1,34 @@
 import os
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import date
 
-from prefect import flow, task, unmapped
+from prefect import flow, serve, task, unmapped
+from prefect.task_runners import ThreadPoolTaskRunner
 from prefect_aws.s3 import S3Bucket
 
+from src.backfill import (
+    DEFAULT_MAX_WORKERS,
+    DEFAULT_REQUESTS_PER_MINUTE,
+    plan_windows,
+    rollup_backfill,
+    run_window,
+)
+
+from src.file_handling import ExportFormats
 from src.orchestration import (
+    DEFAULT_ANALYSIS_FORMAT,
     orchestrate_weather_analysis,
+    orchestrate_weather_analysis_batch,
     orchestrate_weather_collect,
+    orchestrate_weather_collect_batch,
+    orchestrate_weather_compaction,
+    orchestrate_weather_pipeline,
     orchestrate_weather_plot,
+    orchestrate_weather_plot_batch,
+    orchestrate_weather_plot_cache_prune,
+    orchestrate_weather_rollup,
     orchestrate_weather_transform,
 )
 from src.interest_region import REGIONS, Region
@@ -27,50 +49,332 @@ except ValueError as e:
     raise ValueError("AWS credentials/S3 bucket not found") from e
 
 
-@task(retries=3)
-def orchestrate_weather_collect_task(region: Region, s3_base_path: str) -> dict:
-    return orchestrate_weather_collect(region, s3_base_path)
+# Tasks of each stage running at once in pipelined mode. Prefect tag
+# concurrency limits on the same names apply on top, if configured.
+DEFAULT_STAGE_CONCURRENCY = {
+    "collect": 4,
+    "transform": 4,
+    "analysis": 2,
+    "plot": 2,
+    "rollup": 2,
+}
+_stage_slots: dict[str, threading.BoundedSemaphore] = {}
+
+
+def set_stage_concurrency(limits: dict[str, int] | None) -> None:
+    """Bound the tasks of each stage run by this process; None lifts it."""
+    _stage_slots.clear()
+    for stage, limit in (limits or {}).items():
+        _stage_slots[stage] = threading.BoundedSemaphore(limit)
+
+
+@contextmanager
+def stage_slot(stage: str) -> Iterator[None]:
+    slot = _stage_slots.get(stage)
+    if slot is None:
+        yield
+        return
+    with slot:
+        yield
+
+
+@task(retries=3, tags=["collect"])
+def orchestrate_weather_collect_task(
+    region: Region, s3_base_path: str, state_s3_base_path: str | None = None
+) -> dict:
+    with stage_slot("collect"):
+        return orchestrate_weather_collect(region, s3_base_path, state_s3_base_path)
 
 
 @task(retries=3)
-def orchestrate_weather_transform_task(ctx: dict, s3_base_path: str) -> dict:
-    return orchestrate_weather_transform(ctx, s3_base_path)
+def orchestrate_weather_collect_batch_task(
+    regions: list[Region], s3_base_path: str, state_s3_base_path: str | None = None
+) -> list[dict]:
+    return orchestrate_weather_collect_batch(regions, s3_base_path, state_s3_base_path)
+
+
+@task(retries=3, tags=["transform"])
+def orchestrate_weather_transform_task(
+    ctx: dict, s3_base_path: str, aggregate_s3_base_path: str | None = None
+) -> dict:
+    with stage_slot("transform"):
+        return orchestrate_weather_transform(ctx, s3_base_path, aggregate_s3_base_path)
 
 
 @task(retries=3, tags=["analysis"])
-def orchestrate_weather_analysis_task(ctx: dict, s3_base_path: str) -> dict:
-    return orchestrate_weather_analysis(ctx, s3_base_path)
+def orchestrate_weather_analysis_task(
+    ctx: dict, s3_base_path: str, format: str = DEFAULT_ANALYSIS_FORMAT
+) -> dict:
+    with stage_slot("analysis"):
+        return orchestrate_weather_analysis(
+            ctx, s3_base_path, format=ExportFormats(format)
+        )
+
+
+@task(retries=3, tags=["analysis"])
+def orchestrate_weather_analysis_batch_task(
+    ctxs: list[dict], s3_base_path: str, format: str = DEFAULT_ANALYSIS_FORMAT
+) -> list[dict]:
+    return orchestrate_weather_analysis_batch(
+        ctxs, s3_base_path, format=ExportFormats(format)
+    )
 
 
 @task(retries=3, tags=["plot"])
 def orchestrate_weather_plot_task(ctx: dict, s3_base_path: str) -> dict:
-    return orchestrate_weather_plot(ctx, s3_base_path)
+    with stage_slot("plot"):
+        return orchestrate_weather_plot(ctx, s3_base_path)
+
+
+@task(retries=3, tags=["plot"])
+def orchestrate_weather_plot_batch_task(
+    ctxs: list[dict], s3_base_path: str
+) -> list[dict]:
+    return orchestrate_weather_plot_batch(ctxs, s3_base_path)
+
+
+@task(retries=3)
+def orchestrate_weather_pipeline_task(
+    regions: list[Region],
+    raw_s3_base_path: str,
+    clean_s3_base_path: str,
+    analysis_s3_base_path: str,
+    state_s3_base_path: str | None = None,
+    aggregate_s3_base_path: str | None = None,
+    analysis_format: str = DEFAULT_ANALYSIS_FORMAT,
+) -> list[dict]:
+    return orchestrate_weather_pipeline(
+        regions,
+        raw_s3_base_path,
+        clean_s3_base_path,
+        analysis_s3_base_path,
+        state_s3_base_path,
+        aggregate_s3_base_path=aggregate_s3_base_path,
+        analysis_format=ExportFormats(analysis_format),
+    )
+
+
+@task(retries=3, tags=["rollup"])
+def orchestrate_weather_rollup_task(ctx: dict, aggregate_s3_base_path: str) -> list:
+    with stage_slot("rollup"):
+        return orchestrate_weather_rollup(ctx, aggregate_s3_base_path)
+
+
+@task(retries=3, tags=["compaction"])
+def orchestrate_weather_compaction_task(region: Region, s3_base_path: str) -> dict:
+    return orchestrate_weather_compaction(region, s3_base_path)
+
+
+@task(retries=3, tags=["compaction"])
+def orchestrate_weather_plot_cache_prune_task(s3_base_path: str) -> int:
+    return orchestrate_weather_plot_cache_prune(s3_base_path)
+
+
+@task(retries=3, tags=["backfill"])
+def backfill_window_task(
+    window: dict,
+    clean_s3_base_path: str,
+    checkpoint_s3_base_path: str,
+    aggregate_s3_base_path: str | None,
+    requests_per_minute: float,
+) -> dict:
+    return run_window(
+        window,
+        clean_s3_base_path,
+        checkpoint_s3_base_path,
+        aggregate_s3_base_path,
+        requests_per_minute,
+    )
+
+
+@task(retries=3, tags=["rollup"])
+def backfill_rollup_task(
+    aggregate_s3_base_path: str, regions: list[Region], start: date, end: date
+) -> None:
+    rollup_backfill(aggregate_s3_base_path, regions, start, end)
+
+
+def _pipelined(
+    raw_s3_path: str,
+    clean_s3_path: str,
+    analysis_s3_path: str,
+    plot_s3_path: str,
+    state_s3_path: str,
+    aggregate_s3_path: str,
+    analysis_format: str,
+) -> None:
+    # Mapping over futures makes each task wait on its own region's upstream
+    # task only, so there is no barrier between stages
+    collect_results = orchestrate_weather_collect_task.map(
+        REGIONS, unmapped(raw_s3_path), unmapped(state_s3_path)
+    )
+    transform_results = orchestrate_weather_transform_task.map(
+        collect_results, unmapped(clean_s3_path), unmapped(aggregate_s3_path)
+    )
+    analysis_results = orchestrate_weather_analysis_task.map(
+        transform_results, unmapped(analysis_s3_path), unmapped(analysis_format)
+    )
+    plot_results = orchestrate_weather_plot_task.map(
+        analysis_results, unmapped(plot_s3_path)
+    )
+    rollup_results = orchestrate_weather_rollup_task.map(
+        transform_results, unmapped(aggregate_s3_path)
+    )
+    plot_results.wait()
+    rollup_results.wait()
 
 
 @flow(log_prints=True, name="weather-flow")
-def main():
+def main(
+    mode: str = "staged",
+    analysis_format: str = DEFAULT_ANALYSIS_FORMAT,
+    stage_concurrency: dict[str, int] | None = None,
+):
+    """
+    Args:
+        mode: "staged" passes every stage through S3 (and can replay raw
+            objects); "fused" runs collect -> transform -> analysis in memory
+            and persists in the background; "pipelined" runs the staged
+            tasks per region, each region moving on to its next stage as
+            soon as its previous one is done.
+        analysis_format: Format of the analysis files read by the plot stage:
+            "parquet", "arrow", "feather" or "csv".
+        stage_concurrency: Tasks of each stage run at once in pipelined mode,
+            merged over DEFAULT_STAGE_CONCURRENCY.
+    """
     bucket_name = os.getenv("BUCKET_NAME")
-    raw_s3_path = unmapped(create_s3_path(bucket_name, "history/raw"))
+    raw_s3_path = create_s3_path(bucket_name, "history/raw")
+    state_s3_path = create_s3_path(bucket_name, "history/state")
+    aggregate_s3_path = create_s3_path(bucket_name, "history/aggregates")
+
+    if mode == "fused":
+        orchestrate_weather_pipeline_task(
+            REGIONS,
+            raw_s3_path,
+            create_s3_path(bucket_name, "history/clean"),
+            create_s3_path(bucket_name, "history/analysis"),
+            state_s3_path,
+            aggregate_s3_path,
+            analysis_format,
+        )
+        return
+
+    if mode == "pipelined":
+        set_stage_concurrency(DEFAULT_STAGE_CONCURRENCY | (stage_concurrency or {}))
+        try:
+            _pipelined(
+                raw_s3_path,
+                create_s3_path(bucket_name, "history/clean"),
+                create_s3_path(bucket_name, "history/analysis"),
+                create_s3_path(bucket_name, "history/plot"),
+                state_s3_path,
+                aggregate_s3_path,
+                analysis_format,
+            )
+        finally:
+            set_stage_concurrency(None)
+        return
+
     clean_s3_path = unmapped(create_s3_path(bucket_name, "history/clean"))
-    analysis_s3_path = unmapped(create_s3_path(bucket_name, "history/analysis"))
 
-    collect_results = orchestrate_weather_collect_task.map(
-        REGIONS,
-        raw_s3_path,
+    collect_results = orchestrate_weather_collect_batch_task(
+        REGIONS, raw_s3_path, state_s3_path
     )
     transform_results = orchestrate_weather_transform_task.map(
-        collect_results.result(),
+        collect_results,
         clean_s3_path,
+        unmapped(aggregate_s3_path),
     )
-    analysis_results = orchestrate_weather_analysis_task.map(
-        transform_results.result(),
-        analysis_s3_path,
+    transformed = transform_results.result()
+    # Finalized from the daily aggregates of every region in one task
+    analysis_results = orchestrate_weather_analysis_batch_task(
+        transformed,
+        create_s3_path(bucket_name, "history/analysis"),
+        analysis_format,
+    )
+    # Rendered in a process pool, all regions at once
+    orchestrate_weather_plot_batch_task(
+        analysis_results,
+        create_s3_path(bucket_name, "history/plot"),
+    )
+    rollup_results = orchestrate_weather_rollup_task.map(
+        transformed,
+        unmapped(aggregate_s3_path),
+    )
+    rollup_results.wait()
+
+
+@flow(log_prints=True, name="compaction-flow")
+def compaction():
+    bucket_name = os.getenv("BUCKET_NAME")
+    clean_s3_path = unmapped(create_s3_path(bucket_name, "history/clean"))
+
+    compaction_results = orchestrate_weather_compaction_task.map(
+        REGIONS,
+        clean_s3_path,
+    )
+    prune_result = orchestrate_weather_plot_cache_prune_task.submit(
+        create_s3_path(bucket_name, "history/plot")
+    )
+    compaction_results.wait()
+    prune_result.wait()
+
+
+@flow(
+    log_prints=True,
+    name="backfill-flow",
+    task_runner=ThreadPoolTaskRunner(max_workers=DEFAULT_MAX_WORKERS),
+)
+def backfill(
+    start_date: date,
+    end_date: date,
+    regions: list[str] | None = None,
+    requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+):
+    """
+    Load [start_date, end_date] into the clean layer, one task per window.
+
+    Completed windows are checkpointed under history/state, so rerunning the
+    flow with the same dates resumes where a previous run stopped.
+
+    Args:
+        regions: Names of the regions to backfill (default: all regions).
+        requests_per_minute: Maximum rate of API calls over all windows, one
+            per region fetched.
+    """
+    bucket_name = os.getenv("BUCKET_NAME")
+    state_s3_path = create_s3_path(bucket_name, "history/state")
+    aggregate_s3_path = create_s3_path(bucket_name, "history/aggregates")
+    backfill_regions = [r for r in REGIONS if regions is None or r["name"] in regions]
+
+    windows, skipped = plan_windows(
+        backfill_regions, start_date, end_date, state_s3_path
+    )
+    print(f"{len(windows)} window(s) to run, {skipped} region-window(s) done")
+    window_results = backfill_window_task.map(
+        windows,
+        unmapped(create_s3_path(bucket_name, "history/clean")),
+        unmapped(state_s3_path),
+        unmapped(aggregate_s3_path),
+        unmapped(requests_per_minute),
     )
-    analysis_results.wait()
+    window_results.wait()
+    if windows:
+        backfill_rollup_task(aggregate_s3_path, backfill_regions, start_date, end_date)
+    # Fail the run if a window failed; running it again resumes
+    window_results.result()
 
 
 if __name__ == "__main__":
-    main.serve(
-        name="weather-flow",
-        cron="0 0 * * *",
+    serve(
+        main.to_deployment(
+            name="weather-flow",
+            cron="0 0 * * *",
+        ),
+        compaction.to_deployment(
+            name="compaction-flow",
+            cron="30 1 * * *",
+        ),
+        # Run on demand, with the date range as parameters
+        backfill.to_deployment(name="backfill-flow"),
     )
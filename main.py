@@ -7,10 +7,12 @@ from dotenv import load_dotenv
 from rich.console import Console
 from rich.logging import RichHandler
 
+from src.file_handling import ExportFormats
 from src.orchestration import (
     orchestrate_weather_collect,
     orchestrate_weather_transform,
     orchestrate_weather_analysis,
+    orchestrate_weather_pipeline,
 )
 from src.utils import create_s3_path
 
@@ -21,6 +23,11 @@ console = Console()
 
 LATITUDE, LONGITUDE = -23.55, -46.63  # São Paulo, Brazil
 
+# "staged" round-trips every stage through S3, "fused" runs in memory
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "staged")
+# Format of the analysis files: parquet, arrow, feather or csv
+ANALYSIS_FORMAT = ExportFormats(os.getenv("ANALYSIS_FORMAT", "parquet"))
+
 BASE_DIR = Path(__file__).parent / "data"
 RAW_DIR = BASE_DIR / "raw"
 CLEAN_DIR = BASE_DIR / "clean"
@@ -44,6 +51,24 @@ def main():
     try:
         bucket_name = os.getenv("BUCKET_NAME")
 
+        if PIPELINE_MODE == "fused":
+            logger.info("Running fused weather pipeline")
+            results = orchestrate_weather_pipeline(
+                regions=[
+                    dict(name="São Paulo", latitude=LATITUDE, longitude=LONGITUDE)
+                ],
+                raw_s3_base_path=create_s3_path(bucket_name, "history/raw"),
+                clean_s3_base_path=create_s3_path(bucket_name, "history/clean"),
+                analysis_s3_base_path=create_s3_path(bucket_name, "history/analysis"),
+                state_s3_base_path=create_s3_path(bucket_name, "history/state"),
+                analysis_format=ANALYSIS_FORMAT,
+            )
+            for result in results:
+                logger.info(
+                    f"Data analyzed for {result['region']}: {result['s3_path']!r}"
+                )
+            return
+
         logger.info("Fetching weather data")
         result = orchestrate_weather_collect(
             region=dict(
@@ -52,6 +77,7 @@ def main():
                 longitude=LONGITUDE,
             ),
             s3_base_path=create_s3_path(bucket_name, "history/raw"),
+            state_s3_base_path=create_s3_path(bucket_name, "history/state"),
         )
         logger.info(f"Data collected for {result['region']}: {result['s3_path']!r}")
         result = orchestrate_weather_transform(
@@ -62,6 +88,7 @@ def main():
         result = orchestrate_weather_analysis(
             result,
             create_s3_path(bucket_name, "history/analysis"),
+            format=ANALYSIS_FORMAT,
         )
         logger.info(f"Data analyzed for {result['region']}: {result['s3_path']!r}")
     except Exception:
@@ -0,0 +1,117 @@
+"""
+Compare exact and approximate analysis_weather on synthetic multi-year data.
+
+Every variant runs in a fresh process, so the reported peak RSS is its own.
+
+    uv run python -m scripts.bench_analysis --years 20 --regions 10
+"""
+
+import multiprocessing
+import resource
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+import typer
+
+from src.query_weather import AnalysisEngine, analysis_weather_by_region
+
+
+app = typer.Typer()
+
+
+def _generate(directory: Path, years: int, regions: int, seed: int) -> str:
+    """Write hourly rows, one Hive partition per region, like the clean layer."""
+    rng = np.random.default_rng(seed)
+    end = datetime(2024, 12, 31, 23)
+    times = pl.datetime_range(
+        end.replace(year=end.year - years + 1, month=1, day=1, hour=0),
+        end,
+        "1h",
+        eager=True,
+    )
+    hours = np.arange(len(times))
+    for region in range(regions):
+        daily_cycle = 6 * np.sin(2 * np.pi * (hours % 24) / 24)
+        df = pl.DataFrame(
+            {
+                "time": times,
+                # ERA5 values come with one decimal
+                "temperature_2m": np.round(
+                    20 + daily_cycle + rng.normal(0, 3, len(times)), 1
+                ),
+                "windspeed_10m": np.round(rng.gamma(2, 4, len(times)), 1),
+                "relative_humidity_2m": np.round(
+                    np.clip(rng.normal(70, 15, len(times)), 0, 100), 0
+                ),
+            }
+        )
+        partition = directory / f"region=region_{region:03d}"
+        partition.mkdir(parents=True)
+        df.write_parquet(partition / "part.parquet")
+    return str(directory / "*" / "*.parquet")
+
+
+def _run(glob: str, approximate: bool, threads: int | None, queue) -> None:
+    engine = AnalysisEngine(threads=threads)
+    start = time.perf_counter()
+    df = analysis_weather_by_region(glob, engine=engine, approximate=approximate)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in KiB on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    queue.put((elapsed, peak_rss, df.to_arrow()))
+
+
+def _measure(glob: str, approximate: bool, threads: int | None):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_run, args=(glob, approximate, threads, queue))
+    process.start()
+    elapsed, peak_rss, table = queue.get()
+    process.join()
+    return elapsed, peak_rss, pl.from_arrow(table)
+
+
+@app.command()
+def main(
+    years: int = typer.Option(10, help="Years of hourly history per region"),
+    regions: int = typer.Option(10, help="Number of regions"),
+    repeat: int = typer.Option(3, help="Runs per variant; the best time is kept"),
+    threads: int = typer.Option(None, help="DuckDB threads (default: all cores)"),
+    seed: int = typer.Option(0, help="Random seed of the synthetic data"),
+):
+    with tempfile.TemporaryDirectory() as directory:
+        glob = _generate(Path(directory), years, regions, seed)
+        typer.echo(f"{years} year(s) x {regions} region(s) of hourly rows")
+
+        results = {}
+        for approximate in (False, True):
+            runs = [_measure(glob, approximate, threads) for _ in range(repeat)]
+            elapsed = min(run[0] for run in runs)
+            peak_rss = max(run[1] for run in runs)
+            results[approximate] = runs[0][2]
+            label = "approximate" if approximate else "exact"
+            typer.echo(
+                f"{label:>12}: {elapsed:.3f}s, peak RSS {peak_rss / 2**20:.0f} MiB"
+            )
+
+    exact, approx = (results[key].sort("region", "day") for key in (False, True))
+    for column in exact.columns:
+        if not column.startswith(("median_", "mode_")):
+            continue
+        error = (exact[column] - approx[column]).abs()
+        typer.echo(
+            f"{column:>28}: max abs error {error.max():.3f}, "
+            f"differs on {(error > 0).mean():.1%} of days"
+        )
+    typer.echo(
+        "Days with mostly distinct values have many tied exact modes, so mode "
+        "differences also reflect tie-breaking."
+    )
+
+
+if __name__ == "__main__":
+    app()
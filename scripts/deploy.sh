@@ -13,3 +13,8 @@ uvx prefect-cloud deploy flows/weather_flow.py:main \
     --from jonatasleon/weather-pipeline \
     --with-requirements requirements.txt
 uvx prefect-cloud schedule main/main "0 */3 * * *"
+
+uvx prefect-cloud deploy flows/weather_flow.py:compaction \
+    --from jonatasleon/weather-pipeline \
+    --with-requirements requirements.txt
+uvx prefect-cloud schedule compaction/compaction "30 1 * * *"
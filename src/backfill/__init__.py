@@ -0,0 +1,282 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from itertools import batched
+from typing import TypedDict
+
+import polars as pl
+
+from src import clean_layer, daily_aggregates, rollups
+from src.fetch_weather import (
+    FINALIZED_AFTER_DAYS,
+    MAX_LOCATIONS_PER_REQUEST,
+    fetch_weather_history_batch,
+)
+from src.file_handling import list_bucket_objects, write_object
+from src.interest_region import Region
+from src.rate_governor import get_governor
+from src.transform_weather import transform_weather
+from src.utils import region_slug
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 4
+# API calls per minute; Open-Meteo bills every location of a request as a call
+DEFAULT_REQUESTS_PER_MINUTE = 60.0
+# Backfills draw from their own bucket, on top of the API-wide one, so they
+# leave room for the scheduled runs. Both count calls the same way.
+RATE_GOVERNOR_BUCKET = "backfill"
+
+
+class BackfillWindow(TypedDict):
+    """Regions fetched with a single request, over [start, end] (ISO dates)."""
+
+    regions: list[Region]
+    start: str
+    end: str
+
+
+class WindowResult(TypedDict):
+    start: str
+    end: str
+    regions: list[str]
+    rows: int
+
+
+class BackfillReport(TypedDict):
+    windows: int
+    skipped: int
+    completed: int
+    failed: int
+    rows: int
+
+
+def _month_spans(start_date: date, end_date: date) -> list[tuple[date, date]]:
+    """
+    Split [start_date, end_date] at month boundaries.
+
+    Clean-layer files are partitioned by month, so each window then writes a
+    single file per region.
+    """
+    spans = []
+    start = start_date
+    while start <= end_date:
+        next_month = (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+        end = min(next_month - timedelta(days=1), end_date)
+        spans.append((start, end))
+        start = next_month
+    return spans
+
+
+def checkpoint_path(
+    checkpoint_s3_base_path: str, region_name: str, start: date, end: date
+) -> str:
+    """Marker of a region's completed window."""
+    return (
+        f"{checkpoint_s3_base_path}/backfill/{region_slug(region_name)}/"
+        f"{start:%Y%m%d}_{end:%Y%m%d}.json"
+    )
+
+
+def _completed_checkpoints(checkpoint_s3_base_path: str) -> set[str]:
+    bucket, _, prefix = checkpoint_s3_base_path.removeprefix("s3://").partition("/")
+    return set(list_bucket_objects(bucket, f"{prefix}/backfill/"))
+
+
+def plan_windows(
+    regions: list[Region],
+    start_date: date,
+    end_date: date,
+    checkpoint_s3_base_path: str,
+    chunk_size: int = MAX_LOCATIONS_PER_REQUEST,
+) -> tuple[list[BackfillWindow], int]:
+    """
+    Split a backfill into API-sized windows, leaving out completed ones.
+
+    Every window covers at most one calendar month and chunk_size regions,
+    so it is fetched with a single request.
+
+    Returns:
+        The pending windows, oldest first, and the number of region-windows
+        skipped because they were checkpointed by a previous run.
+    """
+    completed = _completed_checkpoints(checkpoint_s3_base_path)
+    windows: list[BackfillWindow] = []
+    skipped = 0
+    for start, end in _month_spans(start_date, end_date):
+        pending = [
+            region
+            for region in regions
+            if checkpoint_path(checkpoint_s3_base_path, region["name"], start, end)
+            not in completed
+        ]
+        skipped += len(regions) - len(pending)
+        windows += [
+            {"regions": list(chunk), "start": start.isoformat(), "end": end.isoformat()}
+            for chunk in batched(pending, chunk_size)
+        ]
+    return windows, skipped
+
+
+def _is_final(end: date) -> bool:
+    # Recent ERA5 days are still revised; their windows are left pending so
+    # a later backfill fetches them again
+    return date.today() - end >= timedelta(days=FINALIZED_AFTER_DAYS)
+
+
+def run_window(
+    window: BackfillWindow,
+    clean_s3_base_path: str,
+    checkpoint_s3_base_path: str,
+    aggregate_s3_base_path: str | None = None,
+    requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+) -> WindowResult:
+    """
+    Fetch one window and upsert it into the clean tables of its regions.
+
+    Each region is checkpointed as soon as its rows are committed, so a
+    window interrupted midway is only redone for the regions it had not
+    committed yet. Windows ending less than FINALIZED_AFTER_DAYS ago are not
+    checkpointed, as ERA5 still revises those days.
+
+    Args:
+        window: Window to run, see plan_windows.
+        clean_s3_base_path: Root of the clean layer.
+        checkpoint_s3_base_path: Root under which completed windows are
+            recorded.
+        aggregate_s3_base_path: Root of the rollup pyramid. If given, the
+            daily aggregate states of the window's days are recomputed too.
+        requests_per_minute: Rate of API calls (one per region of a window),
+            shared by every thread and process running a backfill. The
+            API-wide rate limit of the HTTP client applies as well.
+    """
+    start, end = date.fromisoformat(window["start"]), date.fromisoformat(window["end"])
+    governor = get_governor(RATE_GOVERNOR_BUCKET, requests_per_minute)
+    waited = governor.acquire(len(window["regions"]))
+    # One-off history would evict the recent days scheduled runs rely on
+    payloads = fetch_weather_history_batch(window["regions"], start, end, cache=None)
+    logger.info(
+        f"Fetched {start}..{end} for {len(window['regions'])} region(s) "
+        f"after {waited:.1f}s of rate limiting"
+    )
+
+    rows = 0
+    for region in window["regions"]:
+        df = transform_weather(pl.from_dict(payloads[region["name"]]["hourly"]))
+        # Hours not published yet come back as nulls
+        df = df.filter(pl.col("temperature_2m").is_not_null())
+        table = clean_layer.table_path(clean_s3_base_path, region["name"])
+        manifest = clean_layer.upsert(table, df, name_prefix=f"backfill_{start:%Y%m%d}")
+        if aggregate_s3_base_path is not None:
+            daily_aggregates.refresh(
+                rollups.level_table(aggregate_s3_base_path, "daily", region["name"]),
+                table,
+                df,
+            )
+        if _is_final(end):
+            checkpoint = {"rows": df.height, "completed_at": datetime.now().isoformat()}
+            write_object(
+                json.dumps(checkpoint).encode("utf-8"),
+                checkpoint_path(checkpoint_s3_base_path, region["name"], start, end),
+            )
+        rows += df.height
+        logger.info(
+            f"Backfilled {df.height} rows of {region['name']} for {start}..{end} "
+            f"(version {manifest['version']})"
+        )
+
+    return {
+        "start": window["start"],
+        "end": window["end"],
+        "regions": [region["name"] for region in window["regions"]],
+        "rows": rows,
+    }
+
+
+def rollup_backfill(
+    aggregate_s3_base_path: str, regions: list[Region], start_date: date, end_date: date
+) -> None:
+    """Roll the backfilled days up into weeks, months and years."""
+    first_day = datetime.combine(start_date, datetime.min.time())
+    last_day = datetime.combine(end_date, datetime.min.time())
+    for region in regions:
+        rollups.rollup(aggregate_s3_base_path, region["name"], first_day, last_day)
+
+
+def backfill(
+    regions: list[Region],
+    start_date: date,
+    end_date: date,
+    clean_s3_base_path: str,
+    checkpoint_s3_base_path: str,
+    aggregate_s3_base_path: str | None = None,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+) -> BackfillReport:
+    """
+    Load the ERA5 history of regions over a date range into the clean layer.
+
+    The job is split into monthly windows (see plan_windows) run by
+    max_workers threads, with API calls spaced to requests_per_minute. Each
+    completed region-window is checkpointed, so running the same backfill
+    again after a crash only fetches what is missing. A failed window is
+    logged and left pending rather than stopping the others. Watermarks are
+    not touched: scheduled runs keep collecting from where they are.
+
+    Args:
+        regions: Regions to backfill.
+        start_date: First day to load (inclusive).
+        end_date: Last day to load (inclusive).
+        clean_s3_base_path: Root of the clean layer.
+        checkpoint_s3_base_path: Root under which completed windows are
+            recorded, e.g. the pipeline's state path.
+        aggregate_s3_base_path: Root of the rollup pyramid, kept up to date
+            if given.
+        max_workers: Number of windows run concurrently.
+        requests_per_minute: Maximum rate of API calls of the backfill,
+            counting one per region of a request.
+    """
+    windows, skipped = plan_windows(
+        regions, start_date, end_date, checkpoint_s3_base_path
+    )
+    logger.info(
+        f"Backfilling {start_date}..{end_date}: {len(windows)} window(s) to run, "
+        f"{skipped} region-window(s) already done"
+    )
+    report: BackfillReport = {
+        "windows": len(windows),
+        "skipped": skipped,
+        "completed": 0,
+        "failed": 0,
+        "rows": 0,
+    }
+    with ThreadPoolExecutor(max_workers) as executor:
+        futures = [
+            executor.submit(
+                run_window,
+                window,
+                clean_s3_base_path,
+                checkpoint_s3_base_path,
+                aggregate_s3_base_path,
+                requests_per_minute,
+            )
+            for window in windows
+        ]
+        for window, future in zip(windows, futures, strict=True):
+            try:
+                result = future.result()
+            except Exception:
+                logger.error(
+                    f"Backfill window {window['start']}..{window['end']} failed",
+                    exc_info=True,
+                )
+                report["failed"] += 1
+                continue
+            report["completed"] += 1
+            report["rows"] += result["rows"]
+
+    if aggregate_s3_base_path is not None and report["completed"]:
+        rollup_backfill(aggregate_s3_base_path, regions, start_date, end_date)
+    return report
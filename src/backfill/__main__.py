@@ -0,0 +1,75 @@
+from datetime import datetime
+
+import typer
+from dotenv import load_dotenv
+
+from src.interest_region import REGIONS
+from src.utils import create_s3_path
+
+from . import DEFAULT_MAX_WORKERS, DEFAULT_REQUESTS_PER_MINUTE, backfill
+
+load_dotenv()
+
+
+app = typer.Typer(help="Load historical weather into the clean layer")
+
+
+@app.command()
+def main(
+    bucket_name: str = typer.Argument(..., help="Name of the S3 bucket"),
+    start_date: datetime = typer.Argument(
+        ..., formats=["%Y-%m-%d"], help="First day to load"
+    ),
+    end_date: datetime = typer.Argument(
+        ..., formats=["%Y-%m-%d"], help="Last day to load"
+    ),
+    region: list[str] | None = typer.Option(
+        None,
+        "--region",
+        "-r",
+        help="Region to backfill (repeatable, default: all regions)",
+    ),
+    workers: int = typer.Option(
+        DEFAULT_MAX_WORKERS, "--workers", "-w", help="Windows run concurrently"
+    ),
+    requests_per_minute: float = typer.Option(
+        DEFAULT_REQUESTS_PER_MINUTE,
+        "--rpm",
+        help="Maximum API calls per minute, one per region fetched",
+    ),
+    aggregates: bool = typer.Option(
+        True, help="Keep the daily aggregates and rollups up to date"
+    ),
+):
+    """
+    Backfill a date range, month by month; rerun to resume after a failure.
+    """
+    regions = [r for r in REGIONS if region is None or r["name"] in region]
+    if region and len(regions) != len(region):
+        unknown = set(region) - {r["name"] for r in regions}
+        raise typer.BadParameter(
+            f"Unknown region(s): {', '.join(sorted(unknown))}", param_hint="--region"
+        )
+
+    report = backfill(
+        regions,
+        start_date.date(),
+        end_date.date(),
+        create_s3_path(bucket_name, "history/clean"),
+        create_s3_path(bucket_name, "history/state"),
+        create_s3_path(bucket_name, "history/aggregates") if aggregates else None,
+        max_workers=workers,
+        requests_per_minute=requests_per_minute,
+    )
+    typer.echo(
+        f"{report['completed']}/{report['windows']} window(s) completed, "
+        f"{report['rows']} rows loaded, {report['skipped']} region-window(s) "
+        f"already done"
+    )
+    if report["failed"]:
+        typer.echo(f"{report['failed']} window(s) failed; rerun to resume")
+        raise typer.Exit(1)
+
+
+if __name__ == "__main__":
+    app()
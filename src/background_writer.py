@@ -0,0 +1,51 @@
+import logging
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundWriter:
+    """
+    Run persistence jobs (uploads, commits) on a thread pool.
+
+    Jobs are submitted as soon as their data is ready so that compute for the
+    next step is not blocked on S3. close() waits for every job and re-raises
+    the first failure, so nothing is silently lost.
+
+    Args:
+        max_workers: Number of concurrent jobs.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="background-writer"
+        )
+        self._futures: list[Future] = []
+
+    def submit[T](self, fn: Callable[..., T], *args, **kwargs) -> Future[T]:
+        future = self._executor.submit(fn, *args, **kwargs)
+        self._futures.append(future)
+        return future
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        errors = [f.exception() for f in self._futures if f.exception() is not None]
+        for error in errors[1:]:
+            logger.error("Background write failed", exc_info=error)
+        if errors:
+            raise errors[0]
+
+    def __enter__(self) -> "BackgroundWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            # Don't mask the original error with a write failure
+            try:
+                self.close()
+            except Exception:
+                logger.error("Background write failed", exc_info=True)
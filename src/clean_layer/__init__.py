@@ -0,0 +1,439 @@
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import TypedDict
+from uuid import uuid4
+
+import polars as pl
+from botocore.exceptions import ClientError
+
+from src.file_handling import (
+    delete_objects,
+    download_dataframe,
+    is_write_conflict,
+    list_bucket_objects,
+    partition_path,
+    read_object,
+    upload_dataframe,
+    write_object,
+)
+from src.utils import region_slug
+
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = "_manifest.json"
+TIME_PARTITION_COLUMNS = ["year", "month"]
+
+# Files below this many rows are merged by compaction; a month of hourly data
+# for one region is ~744 rows, so in practice this yields one file per month.
+SMALL_FILE_ROWS = 100_000
+TARGET_FILE_ROWS = 1_000_000
+# Files replaced by a commit stay readable for this long before vacuum deletes
+# them, so scans that started on the previous manifest can finish.
+EXPIRED_FILE_RETENTION = timedelta(hours=1)
+MAX_COMMIT_ATTEMPTS = 5
+
+
+class DataFile(TypedDict):
+    path: str
+    year: str
+    month: str
+    rows: int
+    min_time: str
+    max_time: str
+
+
+class ExpiredFile(TypedDict):
+    path: str
+    expired_at: str
+
+
+class Manifest(TypedDict):
+    version: int
+    files: list[DataFile]
+    expired: list[ExpiredFile]
+
+
+class CompactionReport(TypedDict):
+    table: str
+    partitions: int
+    files_removed: int
+    files_added: int
+    rows_before: int
+    rows_after: int
+    files_vacuumed: int
+
+
+class UpsertPlan(TypedDict):
+    rows: pl.DataFrame
+    replaced: list[str]
+
+
+class CommitConflictError(RuntimeError):
+    """The manifest changed in a way that invalidates a pending commit."""
+
+
+def table_path(s3_base_path: str, region: str) -> str:
+    """Location of a region's table inside the clean layer."""
+    return partition_path(s3_base_path, {"region": region_slug(region)})
+
+
+def _manifest_path(table: str) -> str:
+    return f"{table}/{MANIFEST_FILENAME}"
+
+
+def _describe(path: str, df: pl.DataFrame, year: str, month: str) -> DataFile:
+    return {
+        "path": path,
+        "year": year,
+        "month": month,
+        "rows": df.height,
+        "min_time": df["time"].min().isoformat(),
+        "max_time": df["time"].max().isoformat(),
+    }
+
+
+def _bootstrap_manifest(table: str) -> Manifest:
+    """Adopt files written before the table had a manifest."""
+    bucket, _, prefix = table.removeprefix("s3://").partition("/")
+    files = []
+    for path in list_bucket_objects(bucket, f"{prefix}/"):
+        if not path.endswith(".parquet"):
+            continue
+        partitions = dict(part.split("=", 1) for part in path.split("/") if "=" in part)
+        df = download_dataframe(path)
+        if df.is_empty():
+            continue
+        files.append(_describe(path, df, partitions["year"], partitions["month"]))
+    if files:
+        logger.info(f"Adopted {len(files)} unmanaged file(s) into {table}")
+    return {"version": 0, "files": files, "expired": []}
+
+
+def read_manifest(table: str) -> tuple[Manifest, str]:
+    """
+    Read a table's manifest.
+
+    A table without a manifest adopts the files already under its prefix;
+    the manifest listing them is written right away.
+
+    Returns:
+        The manifest and its ETag ("" if the manifest does not exist yet).
+    """
+    obj = read_object(_manifest_path(table))
+    if obj is None:
+        manifest = _bootstrap_manifest(table)
+        if not manifest["files"]:
+            return manifest, ""
+        # Persist the adopted files, so they are only scanned once
+        try:
+            etag = write_object(
+                json.dumps(manifest).encode("utf-8"),
+                _manifest_path(table),
+                if_match="",
+            )
+        except ClientError as e:
+            if not is_write_conflict(e):
+                raise
+            # Another reader or a commit got there first
+            return read_manifest(table)
+        return manifest, etag
+    body, etag = obj
+    return json.loads(body), etag
+
+
+def list_files(table: str) -> list[DataFile]:
+    """Live data files of a table, in commit order."""
+    manifest, _ = read_manifest(table)
+    return manifest["files"]
+
+
+def overlapping_files(table: str, start: datetime, end: datetime) -> list[DataFile]:
+    """Live files holding rows in [start, end], according to their time range."""
+    return [
+        file
+        for file in list_files(table)
+        if datetime.fromisoformat(file["min_time"]) <= end
+        and datetime.fromisoformat(file["max_time"]) >= start
+    ]
+
+
+def read_rows(table: str, start: datetime, end: datetime) -> pl.DataFrame:
+    """
+    Read a table's rows in [start, end], time-sorted.
+
+    Only the files overlapping the range are downloaded.
+    """
+    files = overlapping_files(table, start, end)
+    if not files:
+        return pl.DataFrame()
+    rows = pl.concat(
+        [download_dataframe(file["path"]) for file in files], how="diagonal_relaxed"
+    )
+    return (
+        rows.filter(pl.col("time").is_between(start, end))
+        .unique(subset="time", keep="last", maintain_order=True)
+        .sort("time")
+    )
+
+
+def commit(
+    table: str,
+    added: list[DataFile],
+    removed: list[str] | None = None,
+) -> Manifest:
+    """
+    Atomically add and remove data files from a table.
+
+    The manifest is replaced with a conditional PUT, so readers see either
+    the previous or the new set of files, never a mix. Concurrent commits are
+    retried against the latest manifest; if a file to remove is already gone,
+    CommitConflictError is raised and the caller's new files are left
+    unreferenced.
+    """
+    removed = removed or []
+    for _ in range(MAX_COMMIT_ATTEMPTS):
+        manifest, etag = read_manifest(table)
+        live = {file["path"] for file in manifest["files"]}
+        if missing := set(removed) - live:
+            raise CommitConflictError(
+                f"Files already removed from {table}: {', '.join(sorted(missing))}"
+            )
+
+        now = datetime.now().isoformat()
+        new_manifest: Manifest = {
+            "version": manifest["version"] + 1,
+            "files": [file for file in manifest["files"] if file["path"] not in removed]
+            # A first commit bootstraps from a listing that may already
+            # include the files being added
+            + [file for file in added if file["path"] not in live],
+            "expired": manifest["expired"]
+            + [{"path": path, "expired_at": now} for path in removed],
+        }
+        try:
+            write_object(
+                json.dumps(new_manifest).encode("utf-8"),
+                _manifest_path(table),
+                if_match=etag,
+            )
+        except ClientError as e:
+            if is_write_conflict(e):
+                logger.info(f"Manifest of {table} changed concurrently, retrying")
+                continue
+            raise
+        return new_manifest
+    raise CommitConflictError(
+        f"Could not commit to {table} after {MAX_COMMIT_ATTEMPTS} attempts"
+    )
+
+
+def write_files(
+    table: str,
+    df: pl.DataFrame,
+    name_prefix: str = "part",
+) -> list[DataFile]:
+    """
+    Write rows into a table's year/month partitions without committing them.
+
+    Args:
+        table: Table location, see table_path.
+        df: Clean rows, with a `time` column.
+        name_prefix: Prefix of the files written in each partition. A unique
+            suffix is always added, so a retried write never overwrites a
+            file that is already committed.
+    """
+    filename = f"{name_prefix}-{uuid4().hex}.parquet"
+    df = df.with_columns(
+        pl.col("time").dt.strftime("%Y").alias("year"),
+        pl.col("time").dt.strftime("%m").alias("month"),
+    )
+    files = []
+    partitions = df.partition_by(
+        TIME_PARTITION_COLUMNS, as_dict=True, include_key=False, maintain_order=True
+    )
+    for (year, month), partition in partitions.items():
+        path = f"{partition_path(table, {'year': year, 'month': month})}/{filename}"
+        upload_dataframe(partition, path)
+        files.append(_describe(path, partition, year, month))
+    return files
+
+
+def append(table: str, df: pl.DataFrame, name_prefix: str = "part") -> Manifest:
+    """Write rows into a table and commit them."""
+    return commit(table, write_files(table, df, name_prefix))
+
+
+def plan_upsert(
+    table: str,
+    df: pl.DataFrame,
+    read_range: tuple[datetime, datetime] | None = None,
+) -> UpsertPlan:
+    """
+    Merge new rows with the committed rows they overlap, without writing.
+
+    Only files whose [min_time, max_time] range intersects the new rows are
+    read. On duplicate timestamps the new row wins.
+
+    Args:
+        table: Table location, see table_path.
+        df: New clean rows.
+        read_range: Widen the set of files merged to those overlapping this
+            range, e.g. to get every committed hour of the days touched.
+
+    Returns:
+        The merged, time-sorted rows and the files they replace.
+    """
+    if df.is_empty():
+        return {"rows": df, "replaced": []}
+
+    start, end = read_range or (df["time"].min(), df["time"].max())
+    overlapping = overlapping_files(table, start, end)
+    rows = pl.concat(
+        [*(download_dataframe(file["path"]) for file in overlapping), df],
+        how="diagonal_relaxed",
+    )
+    rows = rows.unique(subset="time", keep="last", maintain_order=True).sort("time")
+    return {"rows": rows, "replaced": [file["path"] for file in overlapping]}
+
+
+def apply_upsert(table: str, plan: UpsertPlan, name_prefix: str = "part") -> Manifest:
+    """
+    Write a planned upsert and swap it in with a single commit.
+
+    Raises:
+        CommitConflictError: If a replaced file was removed concurrently (e.g.
+            by compaction). The files written for the plan are deleted.
+    """
+    added = write_files(table, plan["rows"], name_prefix)
+    try:
+        return commit(table, added, plan["replaced"])
+    except CommitConflictError:
+        delete_objects([file["path"] for file in added])
+        raise
+
+
+def upsert(
+    table: str,
+    df: pl.DataFrame,
+    name_prefix: str = "part",
+) -> Manifest:
+    """
+    Merge rows into a table, last write wins on `time`.
+
+    A plan invalidated by a concurrent commit is recomputed against the
+    latest manifest.
+    """
+    if df.is_empty():
+        manifest, _ = read_manifest(table)
+        return manifest
+
+    attempts = 0
+    while True:
+        plan = plan_upsert(table, df)
+        try:
+            return apply_upsert(table, plan, name_prefix)
+        except CommitConflictError:
+            attempts += 1
+            if attempts >= MAX_COMMIT_ATTEMPTS:
+                raise
+            logger.info(f"Upsert into {table} conflicted, replanning")
+
+
+def vacuum(table: str, retention: timedelta = EXPIRED_FILE_RETENTION) -> int:
+    """Delete expired files older than the retention period."""
+    manifest, etag = read_manifest(table)
+    cutoff = datetime.now() - retention
+    stale = [
+        file
+        for file in manifest["expired"]
+        if datetime.fromisoformat(file["expired_at"]) < cutoff
+    ]
+    if not stale:
+        return 0
+
+    stale_paths = {file["path"] for file in stale}
+    manifest["expired"] = [
+        file for file in manifest["expired"] if file["path"] not in stale_paths
+    ]
+    try:
+        write_object(
+            json.dumps(manifest).encode("utf-8"),
+            _manifest_path(table),
+            if_match=etag,
+        )
+    except ClientError as e:
+        if is_write_conflict(e):
+            # Someone committed meanwhile; the next vacuum will catch up
+            return 0
+        raise
+    delete_objects(sorted(stale_paths))
+    return len(stale_paths)
+
+
+def compact(
+    table: str,
+    small_file_rows: int = SMALL_FILE_ROWS,
+    target_file_rows: int = TARGET_FILE_ROWS,
+) -> CompactionReport:
+    """
+    Merge a table's small files, per partition, into time-sorted files.
+
+    Rows sharing a timestamp are deduplicated, keeping the most recently
+    committed one. The replacement files are swapped in with a single
+    manifest commit; the old files are only deleted by a later vacuum.
+
+    Raises:
+        CommitConflictError: If a file being compacted was replaced
+            concurrently (e.g. by an upsert). The files written for the
+            compaction are deleted.
+    """
+    manifest, _ = read_manifest(table)
+    by_partition: dict[tuple[str, str], list[DataFile]] = {}
+    for file in manifest["files"]:
+        if file["rows"] < small_file_rows:
+            by_partition.setdefault((file["year"], file["month"]), []).append(file)
+
+    report: CompactionReport = {
+        "table": table,
+        "partitions": 0,
+        "files_removed": 0,
+        "files_added": 0,
+        "rows_before": 0,
+        "rows_after": 0,
+        "files_vacuumed": 0,
+    }
+    added: list[DataFile] = []
+    removed: list[str] = []
+    for (year, month), files in sorted(by_partition.items()):
+        if len(files) < 2:
+            continue
+        df = pl.concat(
+            [download_dataframe(file["path"]) for file in files],
+            how="diagonal_relaxed",
+        )
+        merged = df.unique(subset="time", keep="last", maintain_order=True).sort("time")
+        for offset in range(0, merged.height, target_file_rows):
+            added += write_files(table, merged.slice(offset, target_file_rows))
+        removed += [file["path"] for file in files]
+
+        report["partitions"] += 1
+        report["rows_before"] += df.height
+        report["rows_after"] += merged.height
+        logger.info(
+            f"Compacted {len(files)} file(s) of {table} {year}-{month}: "
+            f"{df.height} -> {merged.height} rows"
+        )
+
+    if removed:
+        try:
+            commit(table, added, removed)
+        except CommitConflictError:
+            # E.g. an upsert replaced a small file meanwhile; vacuum only
+            # deletes expired files, so the new ones would never be reclaimed
+            delete_objects([file["path"] for file in added])
+            raise
+    report["files_removed"] = len(removed)
+    report["files_added"] = len(added)
+    report["files_vacuumed"] = vacuum(table)
+    return report
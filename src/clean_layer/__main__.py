@@ -0,0 +1,43 @@
+import typer
+from dotenv import load_dotenv
+
+from src.interest_region import REGIONS
+from src.utils import create_s3_path
+
+from . import SMALL_FILE_ROWS, compact, table_path
+
+load_dotenv()
+
+
+app = typer.Typer(help="Clean layer maintenance")
+
+
+@app.command()
+def compaction(
+    bucket_name: str = typer.Argument(..., help="Name of the S3 bucket"),
+    region: list[str] | None = typer.Option(
+        None,
+        "--region",
+        "-r",
+        help="Region to compact (repeatable, default: all regions)",
+    ),
+    small_file_rows: int = typer.Option(
+        SMALL_FILE_ROWS,
+        "--small-file-rows",
+        help="Files with fewer rows than this are merged",
+    ),
+):
+    """Merge small clean-layer files into time-sorted, deduplicated files."""
+    clean_s3_path = create_s3_path(bucket_name, "history/clean")
+    regions = region or [r["name"] for r in REGIONS]
+    for name in regions:
+        report = compact(table_path(clean_s3_path, name), small_file_rows)
+        typer.echo(
+            f"{name}: {report['files_removed']} file(s) -> {report['files_added']}, "
+            f"{report['rows_before']} -> {report['rows_after']} rows, "
+            f"{report['files_vacuumed']} expired file(s) deleted"
+        )
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,294 @@
+import logging
+from datetime import datetime
+
+import polars as pl
+
+from src import clean_layer
+from src.fetch_weather import HOURLY_VARIABLES
+
+
+logger = logging.getLogger(__name__)
+
+# Suffix of each variable's statistics in the analysis output
+STATISTIC_NAMES = {
+    "temperature_2m": "temp",
+    "windspeed_10m": "windspeed",
+    "relative_humidity_2m": "relative_humidity",
+}
+
+_HISTOGRAM_TYPE = pl.List(pl.Struct({"value": pl.Float64, "count": pl.Int64}))
+
+
+def _state_column(variable: str, part: str) -> str:
+    return f"{variable}_{part}"
+
+
+def _histograms(rows: pl.DataFrame, keys: list[str], variable: str) -> pl.DataFrame:
+    """Exact value -> count histogram of a variable per group."""
+    return (
+        rows.select(*keys, pl.col(variable).alias("value"))
+        .drop_nulls("value")
+        .group_by(*keys, "value")
+        .len(name="count")
+        .sort(*keys, "value")
+        .group_by(keys, maintain_order=True)
+        .agg(
+            pl.struct(pl.col("value"), pl.col("count").cast(pl.Int64)).alias(
+                _state_column(variable, "histogram")
+            )
+        )
+    )
+
+
+def _with_histograms(
+    states: pl.DataFrame, histograms: list[pl.DataFrame], keys: list[str]
+) -> pl.DataFrame:
+    for variable, histogram in zip(HOURLY_VARIABLES, histograms, strict=True):
+        column = _state_column(variable, "histogram")
+        states = states.join(histogram, on=keys, how="left").with_columns(
+            pl.col(column).fill_null(pl.lit([], dtype=_HISTOGRAM_TYPE))
+        )
+    return states
+
+
+def daily_state(rows: pl.DataFrame) -> pl.DataFrame:
+    """
+    Partial aggregate state of hourly clean rows, one row per day.
+
+    Returns:
+        A frame with a `time` column holding the start of each day and, per
+        variable, its non-null count, sum, sum of squares, min, max and an
+        exact value -> count histogram.
+    """
+    rows = rows.with_columns(pl.col("time").dt.truncate("1d"))
+    states = rows.group_by("time").agg(
+        expr
+        for variable in HOURLY_VARIABLES
+        for expr in (
+            pl.col(variable)
+            .count()
+            .cast(pl.Int64)
+            .alias(_state_column(variable, "count")),
+            pl.col(variable).sum().alias(_state_column(variable, "sum")),
+            (pl.col(variable) ** 2).sum().alias(_state_column(variable, "sum_sq")),
+            pl.col(variable).min().alias(_state_column(variable, "min")),
+            pl.col(variable).max().alias(_state_column(variable, "max")),
+        )
+    )
+    histograms = [
+        _histograms(rows, ["time"], variable) for variable in HOURLY_VARIABLES
+    ]
+    return _with_histograms(states, histograms, ["time"]).sort("time")
+
+
+def merge_states(
+    states: pl.DataFrame, every: str | None, keys: list[str] | None = None
+) -> pl.DataFrame:
+    """
+    Combine partial states into coarser periods.
+
+    Args:
+        states: Partial states, as returned by daily_state.
+        every: Period the `time` column is truncated to, e.g. "1w" or "1mo".
+            None merges all the states of a group into one, dated at the
+            earliest of them.
+        keys: Further columns to group by, e.g. ["region"].
+    """
+    group_keys = keys or []
+    keys = [*group_keys, "time"]
+    if every is None:
+        period = pl.col("time").min()
+        if group_keys:
+            period = period.over(group_keys)
+    else:
+        period = pl.col("time").dt.truncate(every)
+    states = states.with_columns(period.alias("time"))
+    merged = states.group_by(keys).agg(
+        expr
+        for variable in HOURLY_VARIABLES
+        for expr in (
+            pl.col(_state_column(variable, "count")).sum(),
+            pl.col(_state_column(variable, "sum")).sum(),
+            pl.col(_state_column(variable, "sum_sq")).sum(),
+            pl.col(_state_column(variable, "min")).min(),
+            pl.col(_state_column(variable, "max")).max(),
+        )
+    )
+    histograms = []
+    for variable in HOURLY_VARIABLES:
+        column = _state_column(variable, "histogram")
+        bins = (
+            states.select(*keys, pl.col(column).alias("bin"))
+            .explode("bin")
+            .drop_nulls("bin")
+            .unnest("bin")
+        )
+        histograms.append(
+            bins.group_by(*keys, "value")
+            .agg(pl.col("count").sum())
+            .sort(*keys, "value")
+            .group_by(keys, maintain_order=True)
+            .agg(pl.struct("value", "count").alias(column))
+        )
+    return _with_histograms(merged, histograms, keys).sort(keys)
+
+
+def _histogram_statistics(
+    states: pl.DataFrame, variable: str, keys: list[str]
+) -> pl.DataFrame:
+    """Median (mean of the middle values) and mode (smallest on ties)."""
+    name = STATISTIC_NAMES[variable]
+    bins = (
+        states.select(*keys, pl.col(_state_column(variable, "histogram")).alias("bin"))
+        .explode("bin")
+        .drop_nulls("bin")
+        .unnest("bin")
+        .sort(*keys, "value")
+        .with_columns(
+            pl.col("count").cum_sum().over(keys).alias("rank"),
+            pl.col("count").sum().over(keys).alias("n"),
+        )
+    )
+    return bins.group_by(keys).agg(
+        (
+            (
+                pl.col("value").filter(pl.col("rank") >= (pl.col("n") + 1) // 2).first()
+                + pl.col("value").filter(pl.col("rank") >= pl.col("n") // 2 + 1).first()
+            )
+            / 2
+        ).alias(f"median_{name}"),
+        pl.col("value")
+        .sort_by("count", "value", descending=[True, False])
+        .first()
+        .alias(f"mode_{name}"),
+    )
+
+
+def finalize(states: pl.DataFrame, keys: list[str] | None = None) -> pl.DataFrame:
+    """
+    Turn partial states into the statistics produced by analysis_weather.
+
+    Variance and standard deviation are the sample ones, derived from the
+    sum of squares; they may differ from DuckDB's in the last digits.
+
+    Args:
+        states: Partial states, daily or merged into coarser periods.
+        keys: Further grouping columns present in states, e.g. ["region"].
+
+    Returns:
+        One row per group, with a `day` column holding the period start,
+        ordered like analysis_weather (most recent first).
+    """
+    keys = [*(keys or []), "time"]
+    statistics = states.select(keys)
+    for variable in HOURLY_VARIABLES:
+        name = STATISTIC_NAMES[variable]
+        count = pl.col(_state_column(variable, "count"))
+        total = pl.col(_state_column(variable, "sum"))
+        variance = (
+            pl.when(count > 1)
+            .then(
+                (pl.col(_state_column(variable, "sum_sq")) - total**2 / count)
+                / (count - 1)
+            )
+            .clip(lower_bound=0)
+        )
+        columns = states.select(
+            *keys,
+            pl.when(count > 0).then(total / count).alias(f"avg_{name}"),
+            pl.col(_state_column(variable, "min")).alias(f"min_{name}"),
+            pl.col(_state_column(variable, "max")).alias(f"max_{name}"),
+            variance.sqrt().alias(f"stddev_{name}"),
+            variance.alias(f"variance_{name}"),
+            count.alias(f"count_{name}"),
+            total.alias(f"sum_{name}"),
+        ).join(_histogram_statistics(states, variable, keys), on=keys, how="left")
+        statistics = statistics.join(columns, on=keys).select(
+            *statistics.columns,
+            f"avg_{name}",
+            f"min_{name}",
+            f"max_{name}",
+            f"median_{name}",
+            f"mode_{name}",
+            f"stddev_{name}",
+            f"variance_{name}",
+            f"count_{name}",
+            f"sum_{name}",
+        )
+    return (
+        statistics.with_columns(pl.col("time").dt.date().alias("time"))
+        .rename({"time": "day"})
+        .sort([*keys[:-1], "day"], descending=[*(False for _ in keys[:-1]), True])
+    )
+
+
+def _whole_days(start: datetime, end: datetime) -> tuple[datetime, datetime]:
+    return (
+        start.replace(hour=0, minute=0, second=0, microsecond=0),
+        end.replace(hour=23, minute=59, second=59, microsecond=999999),
+    )
+
+
+def merge(table: str, clean_table: str, states: pl.DataFrame) -> pl.DataFrame:
+    """
+    Commit recomputed daily states, replacing those of the same days.
+
+    A table without any state yet is first built from the whole clean
+    history, so it never covers only the days written since it was enabled.
+
+    Returns:
+        The states committed.
+    """
+    if not clean_layer.list_files(table):
+        clean_files = clean_layer.list_files(clean_table)
+        if clean_files:
+            logger.info(f"Building {table} from the whole history of {clean_table}")
+            states = daily_state(
+                clean_layer.read_rows(
+                    clean_table,
+                    min(datetime.fromisoformat(f["min_time"]) for f in clean_files),
+                    max(datetime.fromisoformat(f["max_time"]) for f in clean_files),
+                )
+            )
+    if states.is_empty():
+        return states
+    manifest = clean_layer.upsert(table, states, name_prefix="daily")
+    logger.info(
+        f"Merged {states.height} day(s) into {table} (version {manifest['version']})"
+    )
+    return states
+
+
+def refresh(table: str, clean_table: str, new_rows: pl.DataFrame) -> pl.DataFrame:
+    """
+    Recompute the days touched by new clean rows and merge them in.
+
+    Each touched day is recomputed from all of its rows in the clean layer,
+    reading only the clean files that overlap those days, so the cost is
+    proportional to the new data rather than to the whole history.
+
+    Args:
+        table: Aggregate table, see clean_layer.table_path.
+        clean_table: Clean table the states are computed from, already
+            holding new_rows.
+        new_rows: Rows just merged into clean_table.
+
+    Returns:
+        The states committed.
+    """
+    states = pl.DataFrame()
+    if not new_rows.is_empty():
+        rows = clean_layer.read_rows(
+            clean_table, *_whole_days(new_rows["time"].min(), new_rows["time"].max())
+        )
+        states = daily_state(rows)
+    return merge(table, clean_table, states)
+
+
+def read_states(
+    table: str,
+    start: datetime = datetime.min,
+    end: datetime = datetime.max,
+) -> pl.DataFrame:
+    """Daily states of a table whose day starts within [start, end]."""
+    return clean_layer.read_rows(table, start, end)
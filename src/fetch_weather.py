@@ -1,40 +1,231 @@
-import requests
+import os
+from datetime import date, datetime, timedelta
+from itertools import batched
+from typing import Any
 
+from src.http_client import fetch_json, fetch_json_many
+from src.interest_region import Region
+from src.response_cache import ResponseCache, cache_key, get_default_cache
 
-FORECAST_API_URL = "https://api.open-meteo.com/v1/forecast"
-ARCHIVE_API_URL = "https://archive-api.open-meteo.com/v1/era5"
+
+# Overridable so the fetchers can be pointed at a local stub server
+FORECAST_API_URL = os.getenv(
+    "OPEN_METEO_FORECAST_URL", "https://api.open-meteo.com/v1/forecast"
+)
+ARCHIVE_API_URL = os.getenv(
+    "OPEN_METEO_ARCHIVE_URL", "https://archive-api.open-meteo.com/v1/era5"
+)
+
+HOURLY_VARIABLES = ["temperature_2m", "windspeed_10m", "relative_humidity_2m"]
+
+# Open-Meteo accepts comma-separated coordinate lists, but every location is
+# billed as a separate call and long URLs get rejected, so batches are capped.
+MAX_LOCATIONS_PER_REQUEST = 50
+
+# ERA5 days are revised for a few days after first publication; older days
+# are final and cached forever, recent ones only until the next run.
+FINALIZED_AFTER_DAYS = 7
+PROVISIONAL_TTL_SECONDS = 3 * 60 * 60
+
+# Default of the cache arguments, standing for the process-wide cache, so
+# that None can turn caching off
+_DEFAULT_CACHE: Any = object()
 
 
 def fetch_weather_forecast(latitude, longitude, timezone: str = "America/Sao_Paulo"):
     params = {
         "latitude": latitude,
         "longitude": longitude,
-        "hourly": ["temperature_2m", "windspeed_10m", "relative_humidity_2m"],
+        "hourly": HOURLY_VARIABLES,
         "timezone": timezone,
     }
-    res = requests.get(FORECAST_API_URL, params=params)
-    res.raise_for_status()
-    data = res.json()
+    data = fetch_json(FORECAST_API_URL, params)
 
     return data
 
 
+def _history_params(latitude, longitude, start_date, end_date, timezone: str) -> dict:
+    return {
+        "hourly": HOURLY_VARIABLES,
+        "latitude": latitude,
+        "longitude": longitude,
+        "start_date": start_date.strftime("%Y-%m-%d"),
+        "end_date": end_date.strftime("%Y-%m-%d"),
+        "timezone": timezone,
+    }
+
+
+def _as_date(value: date | datetime) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _split_days(payload: dict) -> dict[date, dict]:
+    """Split an hourly payload into one payload per calendar day."""
+    hourly = payload["hourly"]
+    meta = {key: value for key, value in payload.items() if key != "hourly"}
+    bounds: dict[date, list[int]] = {}
+    for i, timestamp in enumerate(hourly["time"]):
+        bounds.setdefault(date.fromisoformat(timestamp[:10]), [i, i])[1] = i + 1
+    return {
+        day: {
+            **meta,
+            "hourly": {name: values[lo:hi] for name, values in hourly.items()},
+        }
+        for day, (lo, hi) in bounds.items()
+    }
+
+
+def _merge_days(day_payloads: list[dict]) -> dict:
+    meta = {key: value for key, value in day_payloads[0].items() if key != "hourly"}
+    hourly = {name: [] for name in day_payloads[0]["hourly"]}
+    for payload in day_payloads:
+        for name, values in payload["hourly"].items():
+            hourly[name].extend(values)
+    return {**meta, "hourly": hourly}
+
+
+def _cache_ttl(day: date) -> float | None:
+    if date.today() - day >= timedelta(days=FINALIZED_AFTER_DAYS):
+        return None
+    return PROVISIONAL_TTL_SECONDS
+
+
+def _resolve_cache(cache: ResponseCache | None) -> ResponseCache | None:
+    return get_default_cache() if cache is _DEFAULT_CACHE else cache
+
+
+def _fetch_history_cached(
+    locations: list[tuple[float, float]],
+    start_date: date,
+    end_date: date,
+    timezone: str,
+    chunk_size: int,
+    cache: ResponseCache | None,
+) -> list[dict]:
+    """
+    Fetch the history of several locations, only requesting uncached days.
+
+    Locations missing the same span of days are batched together, one request
+    per chunk of at most chunk_size locations.
+    """
+    days = [
+        start_date + timedelta(days=offset)
+        for offset in range((end_date - start_date).days + 1)
+    ]
+    keys = [
+        {day: cache_key(lat, lon, day, HOURLY_VARIABLES, timezone) for day in days}
+        for lat, lon in locations
+    ]
+    cached: list[dict[date, dict]] = [{} for _ in locations]
+    spans: dict[tuple[date, date], list[int]] = {}
+    for i, location_keys in enumerate(keys):
+        if cache is not None:
+            for day, key in location_keys.items():
+                if (payload := cache.get(key)) is not None:
+                    cached[i][day] = payload
+        missing = [day for day in days if day not in cached[i]]
+        if missing:
+            spans.setdefault((missing[0], missing[-1]), []).append(i)
+
+    chunks = [
+        (span, chunk)
+        for span, indexes in spans.items()
+        for chunk in batched(indexes, chunk_size)
+    ]
+    requests = [
+        (
+            ARCHIVE_API_URL,
+            _history_params(
+                ",".join(str(locations[i][0]) for i in chunk),
+                ",".join(str(locations[i][1]) for i in chunk),
+                first_day,
+                last_day,
+                timezone,
+            ),
+        )
+        for (first_day, last_day), chunk in chunks
+    ]
+    # Every location counts as one call against the API's rate limit
+    costs = [len(chunk) for _, chunk in chunks]
+    responses = fetch_json_many(requests, costs) if requests else []
+
+    for (_, chunk), data in zip(chunks, responses, strict=True):
+        # A single location comes back as an object instead of a list
+        if isinstance(data, dict):
+            data = [data]
+        for i, payload in zip(chunk, data, strict=True):
+            fetched = _split_days(payload)
+            cached[i].update(fetched)
+            if cache is not None:
+                cache.put_many(
+                    {keys[i][day]: fetched[day] for day in fetched},
+                    {keys[i][day]: _cache_ttl(day) for day in fetched},
+                )
+
+    return [
+        _merge_days([location_days[day] for day in days if day in location_days])
+        for location_days in cached
+    ]
+
+
 def fetch_weather_history(
     latitude,
     longitude,
     start_date,
     end_date,
     timezone: str = "America/Sao_Paulo",
+    cache: ResponseCache | None = _DEFAULT_CACHE,
 ):
-    params = {
-        "hourly": ["temperature_2m", "windspeed_10m", "relative_humidity_2m"],
-        "latitude": latitude,
-        "longitude": longitude,
-        "start_date": start_date.strftime("%Y-%m-%d"),
-        "end_date": end_date.strftime("%Y-%m-%d"),
-        "timezone": timezone,
-    }
-    res = requests.get(ARCHIVE_API_URL, params=params)
-    res.raise_for_status()
-    data = res.json()
+    """
+    Fetch the hourly ERA5 history of one location.
+
+    Days already present in the response cache are not requested again.
+    The process-wide default cache is used unless another one is given;
+    pass cache=None to bypass caching.
+    """
+    (data,) = _fetch_history_cached(
+        [(latitude, longitude)],
+        _as_date(start_date),
+        _as_date(end_date),
+        timezone,
+        chunk_size=1,
+        cache=_resolve_cache(cache),
+    )
     return data
+
+
+def fetch_weather_history_batch(
+    regions: list[Region],
+    start_date,
+    end_date,
+    timezone: str = "America/Sao_Paulo",
+    chunk_size: int = MAX_LOCATIONS_PER_REQUEST,
+    cache: ResponseCache | None = _DEFAULT_CACHE,
+) -> dict[str, dict]:
+    """
+    Fetch the weather history of several regions with one request per chunk.
+
+    Args:
+        regions: Regions to fetch.
+        start_date: First day of the window (inclusive).
+        end_date: Last day of the window (inclusive).
+        timezone: Timezone used by the API to align the hourly series.
+        chunk_size: Maximum number of locations sent in a single request.
+        cache: Response cache consulted before hitting the network
+            (default: the process-wide cache). None bypasses caching.
+
+    Returns:
+        The Open-Meteo payload of each region, keyed by region name.
+    """
+    payloads = _fetch_history_cached(
+        [(region["latitude"], region["longitude"]) for region in regions],
+        _as_date(start_date),
+        _as_date(end_date),
+        timezone,
+        chunk_size=chunk_size,
+        cache=_resolve_cache(cache),
+    )
+    return {
+        region["name"]: payload
+        for region, payload in zip(regions, payloads, strict=True)
+    }
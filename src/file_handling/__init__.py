@@ -1,51 +1,262 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from enum import StrEnum
 from io import BytesIO
 from pathlib import Path
-from typing import BinaryIO
+from typing import BinaryIO, TypedDict
+from urllib.parse import urlparse
 
 import boto3
 import polars as pl
+from boto3.s3.transfer import TransferConfig
 from botocore.client import BaseClient
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "32"))
+
+_client_lock = threading.Lock()
+_session: boto3.session.Session | None = None
+_s3_client: BaseClient | None = None
+_client_pid: int | None = None
+
+
+def get_s3_client() -> BaseClient:
+    """
+    Process-wide S3 client shared by every file_handling function.
+
+    boto3 clients are thread-safe once created, but creating them is not and
+    is expensive (credential chain, endpoint resolution, connection pool), so
+    the client is built once per process, under a lock. The pool size is set
+    by S3_MAX_POOL_CONNECTIONS. A forked child builds its own client.
+    """
+    global _session, _s3_client, _client_pid
+
+    if _s3_client is not None and _client_pid == os.getpid():
+        return _s3_client
+    with _client_lock:
+        if _s3_client is None or _client_pid != os.getpid():
+            _session = boto3.session.Session()
+            _s3_client = _session.client(
+                "s3",
+                config=Config(max_pool_connections=S3_MAX_POOL_CONNECTIONS),
+            )
+            _client_pid = os.getpid()
+    return _s3_client
+
+
+def _frozen_credentials():
+    get_s3_client()
+    credentials = _session.get_credentials()
+    return credentials.get_frozen_credentials() if credentials else None
+
+
+def duckdb_s3_config() -> dict[str, str | bool]:
+    """Credentials of the shared session as DuckDB httpfs settings."""
+    config: dict[str, str | bool] = {}
+    if credentials := _frozen_credentials():
+        config["s3_access_key_id"] = credentials.access_key
+        config["s3_secret_access_key"] = credentials.secret_key
+        if credentials.token:
+            config["s3_session_token"] = credentials.token
+    if region := os.getenv("REGION_NAME") or _session.region_name:
+        config["s3_region"] = region
+    if endpoint_url := os.getenv("AWS_ENDPOINT_URL"):
+        # S3-compatible endpoint (MinIO, localstack, ...)
+        endpoint = urlparse(endpoint_url)
+        config["s3_endpoint"] = endpoint.netloc
+        config["s3_use_ssl"] = endpoint.scheme == "https"
+        config["s3_url_style"] = "path"
+    return config
 
 
 class ExportFormats(StrEnum):
     CSV = "csv"
     PARQUET = "parquet"
+    # Arrow IPC files: uncompressed, so readers can memory-map them
+    ARROW = "arrow"
+    # Arrow IPC files compressed with LZ4, as Feather V2 does by default
+    FEATHER = "feather"
+
+
+PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "zstd")
+
+
+# S3 requires parts of at least 5 MiB (except the last one)
+MULTIPART_PART_SIZE = int(os.getenv("S3_MULTIPART_PART_SIZE", str(8 * 1024 * 1024)))
+
+
+class S3MultipartWriter(io.RawIOBase):
+    """
+    Write-only file object that streams into an S3 multipart upload.
+
+    Writes are buffered up to part_size and each full part is uploaded
+    immediately, so memory stays bounded by one part whatever the total size.
+    Objects smaller than one part are sent with a single PUT. The object is
+    only published by finish(), which leaving the writer's `with` block
+    without an exception calls; closing it any other way (an exception, an
+    explicit close() or garbage collection) aborts the upload, so a partly
+    written object is never published.
+
+    Args:
+        s3_path: S3 path (str starting with 's3://').
+        part_size: Size of every part but the last, in bytes.
+        s3_client: Optional boto3 S3 client. If None, the shared client is used.
+    """
+
+    def __init__(
+        self,
+        s3_path: str,
+        part_size: int = MULTIPART_PART_SIZE,
+        s3_client: BaseClient | None = None,
+    ):
+        super().__init__()
+        self.bucket, self.key = _parse_s3_path(s3_path)
+        self.part_size = part_size
+        self.s3_client = s3_client or get_s3_client()
+        self._buffer = bytearray()
+        self._upload_id: str | None = None
+        self._parts: list[dict] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        while len(self._buffer) >= self.part_size:
+            self._upload_part(bytes(self._buffer[: self.part_size]))
+            del self._buffer[: self.part_size]
+        return len(data)
+
+    def _upload_part(self, body: bytes) -> None:
+        if self._upload_id is None:
+            response = self.s3_client.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key
+            )
+            self._upload_id = response["UploadId"]
+        part_number = len(self._parts) + 1
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=body,
+        )
+        self._parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
+
+    def finish(self) -> None:
+        """Upload what is left and publish the object."""
+        if self.closed:
+            raise ValueError("I/O operation on closed writer")
+        try:
+            if self._upload_id is None:
+                self.s3_client.put_object(
+                    Bucket=self.bucket, Key=self.key, Body=bytes(self._buffer)
+                )
+            else:
+                if self._buffer:
+                    self._upload_part(bytes(self._buffer))
+                self.s3_client.complete_multipart_upload(
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    UploadId=self._upload_id,
+                    MultipartUpload={"Parts": self._parts},
+                )
+                self._upload_id = None
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """Close the writer, aborting the upload unless finish() completed it."""
+        if not self.closed:
+            self.abort()
+
+    def abort(self) -> None:
+        if self._upload_id is not None:
+            self.s3_client.abort_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self._upload_id
+            )
+            self._upload_id = None
+        self._buffer = bytearray()
+        super().close()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.finish()
+        else:
+            self.abort()
 
 
 def to_csv(
-    dataframe: pl.DataFrame,
+    dataframe: pl.DataFrame | pl.LazyFrame,
     s3_path: str,
     s3_client: BaseClient,
 ):
-    """Export DataFrame to CSV in S3."""
-    bucket, key = _parse_s3_path(s3_path)
+    """Export DataFrame to CSV in S3, streamed as a multipart upload."""
+    with S3MultipartWriter(s3_path, s3_client=s3_client) as writer:
+        if isinstance(dataframe, pl.LazyFrame):
+            dataframe.sink_csv(writer)
+        else:
+            dataframe.write_csv(writer)
 
-    buffer = BytesIO()
-    dataframe.write_csv(buffer)
-    buffer.seek(0)
 
-    s3_client.upload_fileobj(buffer, bucket, key)
+def to_parquet(
+    dataframe: pl.DataFrame | pl.LazyFrame,
+    s3_path: str,
+    s3_client: BaseClient,
+):
+    """Export DataFrame to Parquet in S3, streamed as a multipart upload."""
+    with S3MultipartWriter(s3_path, s3_client=s3_client) as writer:
+        if isinstance(dataframe, pl.LazyFrame):
+            dataframe.sink_parquet(writer, compression=PARQUET_COMPRESSION)
+        else:
+            dataframe.write_parquet(writer, compression=PARQUET_COMPRESSION)
 
 
-def to_parquet(
-    dataframe: pl.DataFrame,
+def _to_ipc(
+    dataframe: pl.DataFrame | pl.LazyFrame,
     s3_path: str,
     s3_client: BaseClient,
+    compression: str,
 ):
-    """Export DataFrame to Parquet in S3."""
-    bucket, key = _parse_s3_path(s3_path)
+    with S3MultipartWriter(s3_path, s3_client=s3_client) as writer:
+        if isinstance(dataframe, pl.LazyFrame):
+            dataframe.sink_ipc(writer, compression=compression)
+        else:
+            dataframe.write_ipc(writer, compression=compression)
+
+
+def to_arrow(
+    dataframe: pl.DataFrame | pl.LazyFrame,
+    s3_path: str,
+    s3_client: BaseClient,
+):
+    """Export DataFrame to an uncompressed Arrow IPC file in S3."""
+    _to_ipc(dataframe, s3_path, s3_client, "uncompressed")
 
-    buffer = BytesIO()
-    dataframe.write_parquet(buffer)
-    buffer.seek(0)
 
-    s3_client.upload_fileobj(buffer, bucket, key)
+def to_feather(
+    dataframe: pl.DataFrame | pl.LazyFrame,
+    s3_path: str,
+    s3_client: BaseClient,
+):
+    """Export DataFrame to an LZ4-compressed Arrow IPC (Feather) file in S3."""
+    _to_ipc(dataframe, s3_path, s3_client, "lz4")
 
 
 EXPORTER_MAP = {
     ExportFormats.CSV: to_csv,
     ExportFormats.PARQUET: to_parquet,
+    ExportFormats.ARROW: to_arrow,
+    ExportFormats.FEATHER: to_feather,
 }
 
 
@@ -80,18 +291,24 @@ def _parse_s3_path(s3_path: str) -> tuple[str, str]:
 
 
 def upload_dataframe(
-    dataframe: pl.DataFrame,
+    dataframe: pl.DataFrame | pl.LazyFrame,
     s3_path: str,
     format: ExportFormats | None = None,
+    s3_client: BaseClient | None = None,
 ):
     """
     Export DataFrame to S3.
 
+    The encoded file is streamed into a multipart upload part by part, so it
+    is never held in memory as a whole. A LazyFrame is sunk with Polars'
+    streaming engine without being materialized.
+
     Args:
-        dataframe: The DataFrame to export.
+        dataframe: The DataFrame or LazyFrame to export.
         s3_path: S3 path (str starting with 's3://').
-        format: Export format (CSV or PARQUET). If None, inferred from filename extension.
-        s3_client: Optional boto3 S3 client. If None, a default client is created.
+        format: Export format, see ExportFormats. If None, inferred from
+            filename extension.
+        s3_client: Optional boto3 S3 client. If None, the shared client is used.
 
     Examples:
         export_dataframe(df, "s3://my-bucket/data.csv")
@@ -103,7 +320,8 @@ def upload_dataframe(
     if format is None:
         format = _get_format_by_filename_extension(s3_path)
 
-    s3_client = boto3.client("s3")
+    if s3_client is None:
+        s3_client = get_s3_client()
 
     try:
         exporter_function = EXPORTER_MAP[str(format).lower()]
@@ -114,13 +332,20 @@ def upload_dataframe(
         ) from e
 
 
+def partition_path(s3_base_path: str, partitions: dict[str, object]) -> str:
+    """Build the Hive-style prefix (`key=value/...`) of a dataset partition."""
+    return "/".join(
+        [s3_base_path, *(f"{key}={value}" for key, value in partitions.items())]
+    )
+
+
 def upload_fileobj(
     io_buffer: BytesIO,
     s3_path: str,
     s3_client: BaseClient | None = None,
 ):
     if s3_client is None:
-        s3_client = boto3.client("s3")
+        s3_client = get_s3_client()
 
     bucket, key = _parse_s3_path(s3_path)
 
@@ -138,10 +363,10 @@ def download_file(
     Args:
         s3_path: S3 path (str starting with 's3://').
         output_file: Output file path (str or Path) or file-like object (BinaryIO).
-        s3_client: Optional boto3 S3 client. If None, a default client is created.
+        s3_client: Optional boto3 S3 client. If None, the shared client is used.
     """
     if s3_client is None:
-        s3_client = boto3.client("s3")
+        s3_client = get_s3_client()
 
     bucket, key = _parse_s3_path(s3_path)
 
@@ -156,6 +381,209 @@ def download_file(
             output_file.seek(0)
 
 
+def _read_dataframe(
+    source: BinaryIO | str | Path, format: ExportFormats, memory_map: bool
+) -> pl.DataFrame:
+    if format == ExportFormats.CSV:
+        return pl.read_csv(source, try_parse_dates=True)
+    if format == ExportFormats.PARQUET:
+        return pl.read_parquet(source, memory_map=memory_map)
+    # Compressed IPC buffers must be decompressed, so cannot be mapped
+    return pl.read_ipc(source, memory_map=memory_map and format == ExportFormats.ARROW)
+
+
+def download_dataframe(
+    s3_path: str,
+    format: ExportFormats | None = None,
+    s3_client: BaseClient | None = None,
+) -> pl.DataFrame:
+    """
+    Read a DataFrame exported by upload_dataframe back from S3.
+
+    The object is downloaded once into memory. Parquet and Arrow files keep
+    their column types; CSV dates and datetimes are parsed.
+
+    Args:
+        s3_path: S3 path (str starting with 's3://').
+        format: File format, see ExportFormats. If None, inferred from
+            filename extension.
+        s3_client: Optional boto3 S3 client. If None, the shared client is used.
+    """
+    if format is None:
+        format = _get_format_by_filename_extension(s3_path)
+
+    with BytesIO() as buffer:
+        download_file(s3_path, buffer, s3_client)
+        return _read_dataframe(buffer, format, memory_map=False)
+
+
+def read_dataframe(
+    file_path: str | Path, format: ExportFormats | None = None
+) -> pl.DataFrame:
+    """
+    Read a DataFrame from a local file in any of the ExportFormats.
+
+    Parquet and Arrow files are memory-mapped; Arrow columns are then used
+    in place, without being copied or parsed.
+
+    Args:
+        file_path: Path to the file.
+        format: File format. If None, inferred from filename extension.
+    """
+    if format is None:
+        format = _get_format_by_filename_extension(str(file_path))
+    return _read_dataframe(file_path, format, memory_map=True)
+
+
+def read_object(
+    s3_path: str,
+    s3_client: BaseClient | None = None,
+) -> tuple[bytes, str] | None:
+    """
+    Read a small object from S3.
+
+    Args:
+        s3_path: S3 path (str starting with 's3://').
+        s3_client: Optional boto3 S3 client. If None, the shared client is used.
+
+    Returns:
+        The object body and its ETag, or None if the object does not exist.
+    """
+    if s3_client is None:
+        s3_client = get_s3_client()
+
+    bucket, key = _parse_s3_path(s3_path)
+
+    try:
+        response = s3_client.get_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+            return None
+        raise
+    return response["Body"].read(), response["ETag"]
+
+
+def write_object(
+    body: bytes,
+    s3_path: str,
+    if_match: str | None = None,
+    s3_client: BaseClient | None = None,
+) -> str:
+    """
+    Write a small object to S3, optionally as a compare-and-swap.
+
+    Args:
+        body: Object content.
+        s3_path: S3 path (str starting with 's3://').
+        if_match: ETag the current object must have for the write to succeed.
+            Use "" to only succeed if the object does not exist yet, or None
+            to write unconditionally.
+        s3_client: Optional boto3 S3 client. If None, the shared client is used.
+
+    Returns:
+        The ETag of the written object.
+
+    Raises:
+        botocore.exceptions.ClientError: With code "PreconditionFailed" (or
+            "ConditionalRequestConflict") if the condition did not hold.
+    """
+    if s3_client is None:
+        s3_client = get_s3_client()
+
+    bucket, key = _parse_s3_path(s3_path)
+
+    conditions = {}
+    if if_match == "":
+        conditions["IfNoneMatch"] = "*"
+    elif if_match is not None:
+        conditions["IfMatch"] = if_match
+
+    response = s3_client.put_object(Bucket=bucket, Key=key, Body=body, **conditions)
+    return response["ETag"]
+
+
+def is_write_conflict(error: ClientError) -> bool:
+    """Whether a conditional write_object failed on its condition."""
+    return error.response["Error"]["Code"] in (
+        "PreconditionFailed",
+        "ConditionalRequestConflict",
+    )
+
+
+def object_exists(s3_path: str, s3_client: BaseClient | None = None) -> bool:
+    """Whether an object exists, with a single HEAD request."""
+    if s3_client is None:
+        s3_client = get_s3_client()
+
+    bucket, key = _parse_s3_path(s3_path)
+
+    try:
+        s3_client.head_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+            return False
+        raise
+    return True
+
+
+def copy_object(
+    source_s3_path: str,
+    s3_path: str,
+    s3_client: BaseClient | None = None,
+) -> None:
+    """Copy an object within S3, server-side (up to 5 GiB)."""
+    if s3_client is None:
+        s3_client = get_s3_client()
+
+    source_bucket, source_key = _parse_s3_path(source_s3_path)
+    bucket, key = _parse_s3_path(s3_path)
+    s3_client.copy_object(
+        Bucket=bucket,
+        Key=key,
+        CopySource={"Bucket": source_bucket, "Key": source_key},
+    )
+
+
+def delete_objects(
+    s3_paths: list[str],
+    s3_client: BaseClient | None = None,
+):
+    """
+    Delete objects from S3, in batches of up to 1000 keys per bucket.
+
+    Args:
+        s3_paths: S3 paths (str starting with 's3://') to delete.
+        s3_client: Optional boto3 S3 client. If None, the shared client is used.
+    """
+    if s3_client is None:
+        s3_client = get_s3_client()
+
+    keys_by_bucket: dict[str, list[str]] = {}
+    for s3_path in s3_paths:
+        bucket, key = _parse_s3_path(s3_path)
+        keys_by_bucket.setdefault(bucket, []).append(key)
+
+    for bucket, keys in keys_by_bucket.items():
+        for i in range(0, len(keys), 1000):
+            s3_client.delete_objects(
+                Bucket=bucket,
+                Delete={
+                    "Objects": [{"Key": key} for key in keys[i : i + 1000]],
+                    "Quiet": True,
+                },
+            )
+
+
+def _iter_bucket_objects(
+    bucket_name: str,
+    prefix: str,
+    s3_client: BaseClient,
+) -> Iterator[dict]:
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+        yield from page.get("Contents", [])
+
+
 def list_bucket_objects(
     bucket_name: str,
     prefix: str = "",
@@ -167,24 +595,55 @@ def list_bucket_objects(
     Args:
         bucket_name: Name of the S3 bucket.
         prefix: Optional prefix to filter objects.
-        s3_client: Optional boto3 S3 client. If None, a default client is created.
+        s3_client: Optional boto3 S3 client. If None, the shared client is used.
 
     Returns:
         List of S3 paths (s3://bucket/key) for all objects.
     """
     if s3_client is None:
-        s3_client = boto3.client("s3")
+        s3_client = get_s3_client()
 
-    objects = []
-    paginator = s3_client.get_paginator("list_objects_v2")
+    return [
+        f"s3://{bucket_name}/{obj['Key']}"
+        for obj in _iter_bucket_objects(bucket_name, prefix, s3_client)
+    ]
 
-    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
-        if "Contents" in page:
-            for obj in page["Contents"]:
-                key = obj["Key"]
-                objects.append(f"s3://{bucket_name}/{key}")
 
-    return objects
+def delete_objects_older_than(
+    s3_prefix: str,
+    max_age: timedelta,
+    s3_client: BaseClient | None = None,
+) -> int:
+    """
+    Delete the objects under a prefix last modified more than max_age ago.
+
+    Args:
+        s3_prefix: S3 prefix (str starting with 's3://').
+        max_age: Age beyond which objects are deleted.
+        s3_client: Optional boto3 S3 client. If None, the shared client is used.
+
+    Returns:
+        The number of objects deleted.
+    """
+    if s3_client is None:
+        s3_client = get_s3_client()
+
+    bucket, prefix = _parse_s3_path(s3_prefix)
+    cutoff = datetime.now(timezone.utc) - max_age
+    stale = [
+        f"s3://{bucket}/{obj['Key']}"
+        for obj in _iter_bucket_objects(bucket, prefix, s3_client)
+        if obj["LastModified"] < cutoff
+    ]
+    delete_objects(stale, s3_client)
+    return len(stale)
+
+
+def _local_path_for_key(output_path: Path, key: str) -> Path:
+    """Local path mirroring the S3 key, creating its parent directories."""
+    local_path = output_path.joinpath(*key.split("/"))
+    local_path.parent.mkdir(parents=True, exist_ok=True)
+    return local_path
 
 
 def download_all_from_bucket(
@@ -200,13 +659,13 @@ def download_all_from_bucket(
         bucket_name: Name of the S3 bucket.
         output_dir: Local directory to save downloaded files.
         prefix: Optional prefix to filter objects.
-        s3_client: Optional boto3 S3 client. If None, a default client is created.
+        s3_client: Optional boto3 S3 client. If None, the shared client is used.
 
     Returns:
         List of local file paths where files were downloaded.
     """
     if s3_client is None:
-        s3_client = boto3.client("s3")
+        s3_client = get_s3_client()
 
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
@@ -218,19 +677,224 @@ def download_all_from_bucket(
         bucket, key = _parse_s3_path(s3_path)
 
         # Create local directory structure matching S3 prefix structure
-        key_parts = key.split("/")
-        filename = key_parts[-1]
-
-        # If there are subdirectories in the key, preserve them
-        if len(key_parts) > 1:
-            subdir = output_path / "/".join(key_parts[:-1])
-            subdir.mkdir(parents=True, exist_ok=True)
-            local_path = subdir / filename
-        else:
-            local_path = output_path / filename
+        local_path = _local_path_for_key(output_path, key)
 
         # Download the file
         s3_client.download_file(bucket, key, str(local_path))
         downloaded_files.append(str(local_path))
 
     return downloaded_files
+
+
+SYNC_STATE_FILENAME = ".sync_state.json"
+SYNC_CHUNK_SIZE = 8 * 1024 * 1024
+SYNC_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=SYNC_CHUNK_SIZE,
+    multipart_chunksize=SYNC_CHUNK_SIZE,
+    max_concurrency=4,
+)
+
+
+class SyncReport(TypedDict):
+    downloaded: list[str]
+    skipped: list[str]
+    resumed: list[str]
+    bytes_transferred: int
+    seconds: float
+
+
+def _is_up_to_date(local_path: Path, obj: dict, synced_etag: str | None) -> bool:
+    if not local_path.exists() or local_path.stat().st_size != obj["Size"]:
+        return False
+    if synced_etag is not None:
+        return synced_etag == obj["ETag"]
+    # Not synced before (e.g. fetched by download_all): single-part ETags
+    # are the MD5 of the content, multipart ones can't be checked locally.
+    etag = obj["ETag"].strip('"')
+    if "-" in etag:
+        return False
+    md5 = hashlib.md5()
+    with open(local_path, "rb") as f:
+        for chunk in iter(lambda: f.read(SYNC_CHUNK_SIZE), b""):
+            md5.update(chunk)
+    return md5.hexdigest() == etag
+
+
+def _part_path(local_path: Path) -> Path:
+    """Partial download of a file, renamed into place once complete."""
+    return local_path.with_name(f"{local_path.name}.part")
+
+
+def _etag_path(part_path: Path) -> Path:
+    """Sidecar recording the ETag of the object a `.part` file belongs to."""
+    return part_path.with_name(f"{part_path.name}.etag")
+
+
+def _resume_offset(part_path: Path, obj: dict) -> int:
+    """Bytes of obj already held by its `.part` file, 0 if it can't be resumed."""
+    try:
+        if _etag_path(part_path).read_text() != obj["ETag"]:
+            return 0
+        offset = part_path.stat().st_size
+    except FileNotFoundError:
+        return 0
+    return offset if offset <= obj["Size"] else 0
+
+
+def _download_resumable(
+    bucket: str,
+    obj: dict,
+    part_path: Path,
+    progress: Callable[[int], None],
+    s3_client: BaseClient,
+) -> bool:
+    """
+    Append the missing byte ranges of an object to a `.part` file.
+
+    The ETag of the object being downloaded is kept next to the `.part`
+    file, so a partial download of an earlier version is started over
+    rather than completed with the new version's bytes.
+
+    Returns:
+        Whether an existing partial download was resumed.
+    """
+    offset = _resume_offset(part_path, obj)
+    resumed = offset > 0
+    with open(part_path, "ab" if resumed else "wb") as f:
+        _etag_path(part_path).write_text(obj["ETag"])
+        while offset < obj["Size"]:
+            end = min(offset + SYNC_CHUNK_SIZE, obj["Size"]) - 1
+            # Fails with PreconditionFailed if the object changed since it was
+            # listed; the next sync then lists the new version and starts over
+            response = s3_client.get_object(
+                Bucket=bucket,
+                Key=obj["Key"],
+                Range=f"bytes={offset}-{end}",
+                IfMatch=obj["ETag"],
+            )
+            chunk = response["Body"].read()
+            f.write(chunk)
+            offset += len(chunk)
+            progress(len(chunk))
+    return resumed
+
+
+def sync_bucket(
+    bucket_name: str,
+    output_dir: str | Path,
+    prefix: str = "",
+    max_workers: int = 16,
+    progress: Callable[[int], None] | None = None,
+    on_start: Callable[[int], None] | None = None,
+    s3_client: BaseClient | None = None,
+) -> SyncReport:
+    """
+    Incrementally mirror an S3 prefix into a local directory.
+
+    Objects whose local copy already matches (size and ETag) are skipped.
+    The rest are downloaded by a thread pool: small objects with boto3's
+    managed transfer, large ones in ranged chunks appended to a `.part` file,
+    so an interrupted sync resumes where it stopped. The ETags of synced
+    objects are recorded in `.sync_state.json` inside output_dir.
+
+    Args:
+        bucket_name: Name of the S3 bucket.
+        output_dir: Local directory to mirror into.
+        prefix: Optional prefix to filter objects.
+        max_workers: Number of objects transferred concurrently.
+        progress: Optional callback receiving the number of bytes transferred
+            as they arrive; it may be called from several threads.
+        on_start: Optional callback receiving the total number of bytes to
+            transfer, once the up-to-date objects are known and before any
+            transfer starts.
+        s3_client: Optional boto3 S3 client. If None, the shared client is used.
+
+    Returns:
+        What was downloaded, skipped and resumed, with the transferred volume.
+    """
+    if s3_client is None:
+        s3_client = get_s3_client()
+
+    started = time.monotonic()
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    state_path = output_path / SYNC_STATE_FILENAME
+    state: dict[str, str] = (
+        json.loads(state_path.read_text()) if state_path.exists() else {}
+    )
+
+    report: SyncReport = {
+        "downloaded": [],
+        "skipped": [],
+        "resumed": [],
+        "bytes_transferred": 0,
+        "seconds": 0.0,
+    }
+    lock = threading.Lock()
+
+    def on_bytes(count: int) -> None:
+        with lock:
+            report["bytes_transferred"] += count
+        if progress is not None:
+            progress(count)
+
+    def remaining_bytes(obj: dict) -> int | None:
+        """Bytes left to transfer, or None if the local copy is up to date."""
+        local_path = _local_path_for_key(output_path, obj["Key"])
+        if _is_up_to_date(local_path, obj, state.get(obj["Key"])):
+            with lock:
+                report["skipped"].append(str(local_path))
+                state[obj["Key"]] = obj["ETag"]
+            return None
+        if obj["Size"] < SYNC_TRANSFER_CONFIG.multipart_threshold:
+            return obj["Size"]
+        return obj["Size"] - _resume_offset(_part_path(local_path), obj)
+
+    def sync_object(obj: dict) -> None:
+        local_path = _local_path_for_key(output_path, obj["Key"])
+        part_path = _part_path(local_path)
+        resumed = False
+        if obj["Size"] < SYNC_TRANSFER_CONFIG.multipart_threshold:
+            s3_client.download_file(
+                bucket_name,
+                obj["Key"],
+                str(part_path),
+                Config=SYNC_TRANSFER_CONFIG,
+                Callback=on_bytes,
+            )
+        else:
+            resumed = _download_resumable(
+                bucket_name, obj, part_path, on_bytes, s3_client
+            )
+        os.replace(part_path, local_path)
+        _etag_path(part_path).unlink(missing_ok=True)
+        with lock:
+            report["downloaded"].append(str(local_path))
+            if resumed:
+                report["resumed"].append(str(local_path))
+            state[obj["Key"]] = obj["ETag"]
+
+    objects = [
+        obj
+        for obj in _iter_bucket_objects(bucket_name, prefix, s3_client)
+        if not obj["Key"].endswith("/")
+    ]
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            remaining = list(executor.map(remaining_bytes, objects))
+            pending = [
+                obj
+                for obj, size in zip(objects, remaining, strict=True)
+                if size is not None
+            ]
+            if on_start is not None:
+                on_start(sum(size for size in remaining if size is not None))
+            for future in [executor.submit(sync_object, obj) for obj in pending]:
+                future.result()
+    finally:
+        tmp_state_path = state_path.with_suffix(".tmp")
+        tmp_state_path.write_text(json.dumps(state))
+        os.replace(tmp_state_path, state_path)
+
+    report["seconds"] = time.monotonic() - started
+    return report
@@ -1,7 +1,9 @@
+import threading
+
 import typer
 from dotenv import load_dotenv
 
-from . import download_file, download_all_from_bucket, list_bucket_objects
+from . import download_file, download_all_from_bucket, list_bucket_objects, sync_bucket
 
 load_dotenv()
 
@@ -46,14 +48,76 @@ def download_all(
     typer.echo(f"Downloading all files from bucket: {bucket_name}")
     if prefix:
         typer.echo(f"Filtering by prefix: {prefix}")
-    
+
     downloaded_files = download_all_from_bucket(bucket_name, output_dir, prefix)
-    
+
     typer.echo(f"\nDownloaded {len(downloaded_files)} file(s) to {output_dir}")
     for file_path in downloaded_files:
         typer.echo(f"  - {file_path}")
 
 
+@app.command()
+def sync(
+    bucket_name: str = typer.Argument(..., help="Name of the S3 bucket"),
+    output_dir: str = typer.Option(
+        "data",
+        "--output-dir",
+        "-o",
+        help="Directory to mirror the bucket into",
+    ),
+    prefix: str = typer.Option(
+        "",
+        "--prefix",
+        "-p",
+        help="Optional prefix to filter objects",
+    ),
+    workers: int = typer.Option(
+        16,
+        "--workers",
+        "-w",
+        help="Number of objects transferred concurrently",
+    ),
+):
+    """Mirror a bucket locally, only downloading new or changed objects."""
+    typer.echo(f"Syncing bucket {bucket_name} into {output_dir}")
+    if prefix:
+        typer.echo(f"Filtering by prefix: {prefix}")
+
+    with typer.progressbar(length=0, label="Transferring", show_pos=True) as bar:
+        # The bar isn't thread-safe and its total is only known once the
+        # up-to-date objects have been skipped
+        lock = threading.Lock()
+
+        def on_start(total: int) -> None:
+            with lock:
+                bar.length = total
+                bar.render_progress()
+
+        def progress(count: int) -> None:
+            with lock:
+                bar.update(count)
+
+        report = sync_bucket(
+            bucket_name,
+            output_dir,
+            prefix,
+            max_workers=workers,
+            progress=progress,
+            on_start=on_start,
+        )
+
+    throughput = report["bytes_transferred"] / max(report["seconds"], 1e-9)
+    typer.echo(
+        f"\nDownloaded {len(report['downloaded'])} file(s) "
+        f"({len(report['resumed'])} resumed), "
+        f"skipped {len(report['skipped'])} up-to-date file(s)"
+    )
+    typer.echo(
+        f"Transferred {report['bytes_transferred'] / 1e6:.1f} MB in "
+        f"{report['seconds']:.1f}s ({throughput / 1e6:.1f} MB/s)"
+    )
+
+
 @app.command()
 def list(
     bucket_name: str = typer.Argument(..., help="Name of the S3 bucket"),
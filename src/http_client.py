@@ -0,0 +1,252 @@
+import asyncio
+import atexit
+import logging
+import os
+import random
+import threading
+import time
+from collections.abc import Coroutine, Iterable
+from email.utils import parsedate_to_datetime
+from typing import Any
+
+import httpx
+
+from src.rate_governor import RateGovernor, get_default_governor
+
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+DEFAULT_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("HTTP_MAX_CONCURRENCY", "8"))
+DEFAULT_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "5"))
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def backoff_delay(
+    attempt: int,
+    base: float = BACKOFF_BASE,
+    cap: float = BACKOFF_MAX,
+) -> float:
+    """Exponential backoff with full jitter for the given (0-based) attempt."""
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+def retry_after(response: httpx.Response) -> float | None:
+    """Seconds to wait given by a Retry-After header, as seconds or a date."""
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AsyncHttpClient:
+    """
+    Connection-pooled async HTTP client with bounded concurrency and retries.
+
+    Responses with a status in RETRY_STATUS_CODES and transport errors are
+    retried with jittered exponential backoff; any other error status is
+    raised immediately. A Retry-After header overrides the backoff, and also
+    throttles the rate governor, so other threads and processes hold off too.
+
+    Every attempt first takes tokens from the rate governor, shared by all
+    clients on the machine.
+
+    Args:
+        timeout: Per-request timeout in seconds.
+        max_concurrency: Maximum number of in-flight requests (and pooled
+            connections).
+        max_retries: Number of retries after the first attempt.
+        transport: Optional httpx transport, e.g. to point tests at a stub.
+        governor: Rate governor of the requests. If None, the process-wide
+            default governor is used (which may be disabled).
+    """
+
+    def __init__(
+        self,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        transport: httpx.AsyncBaseTransport | None = None,
+        governor: RateGovernor | None = None,
+    ):
+        self._client = httpx.AsyncClient(
+            http2=_http2_available(),
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+            ),
+            transport=transport,
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._max_retries = max_retries
+        self._governor = governor or get_default_governor()
+
+    async def __aenter__(self) -> "AsyncHttpClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def get_json(
+        self, url: str, params: dict | None = None, cost: float = 1.0
+    ) -> Any:
+        """
+        Args:
+            url: URL to fetch.
+            params: Query parameters.
+            cost: Tokens the request takes from the rate governor, e.g. the
+                number of locations of a multi-location query.
+        """
+        for attempt in range(self._max_retries + 1):
+            is_last_attempt = attempt == self._max_retries
+            if self._governor is not None:
+                waited = await self._governor.acquire_async(cost)
+                if waited >= 1:
+                    logger.info(
+                        f"Waited {waited:.1f}s for rate limit {self._governor.name!r}"
+                    )
+            delay = None
+            async with self._semaphore:
+                try:
+                    res = await self._client.get(url, params=params)
+                except httpx.TransportError as e:
+                    if is_last_attempt:
+                        raise
+                    logger.warning(f"Request to {url} failed ({e!r}), retrying")
+                else:
+                    if res.status_code not in RETRY_STATUS_CODES or is_last_attempt:
+                        res.raise_for_status()
+                        return res.json()
+                    delay = retry_after(res)
+                    logger.warning(
+                        f"Request to {url} returned {res.status_code}, retrying"
+                        + (f" after {delay:.1f}s" if delay is not None else "")
+                    )
+            if delay is None:
+                await asyncio.sleep(backoff_delay(attempt))
+            elif self._governor is not None:
+                # Every caller, this one included, waits it out on acquire
+                await asyncio.to_thread(self._governor.throttle, delay)
+            else:
+                await asyncio.sleep(delay)
+
+    async def get_json_many(
+        self,
+        requests: Iterable[tuple[str, dict | None]],
+        costs: Iterable[float] | None = None,
+    ) -> list[Any]:
+        requests = list(requests)
+        costs = [1.0] * len(requests) if costs is None else list(costs)
+        return await asyncio.gather(
+            *(
+                self.get_json(url, params, cost)
+                for (url, params), cost in zip(requests, costs, strict=True)
+            )
+        )
+
+
+# Every synchronous fetch of a process runs on one background event loop,
+# which owns the shared client, so its connection pool outlives each call.
+_loop_lock = threading.Lock()
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_pid: int | None = None
+_default_client: AsyncHttpClient | None = None
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    global _loop, _loop_pid, _default_client
+    with _loop_lock:
+        # A forked child inherits the loop object but not its thread
+        if _loop is None or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            _default_client = None
+            threading.Thread(
+                target=_loop.run_forever, name="http-client", daemon=True
+            ).start()
+        return _loop
+
+
+def run_sync[T](coro: Coroutine[Any, Any, T]) -> T:
+    """
+    Run a coroutine to completion from synchronous code.
+
+    The coroutine runs on the process's background event loop, so it may be
+    called from any thread, including one already running an event loop.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result()
+
+
+def get_default_client() -> AsyncHttpClient:
+    """
+    Process-wide client, reused by every synchronous fetch.
+
+    Its connections (and HTTP/2 sessions) stay open across calls and across
+    the threads of the process, and its concurrency bound applies to all of
+    them together.
+    """
+    global _default_client
+    _background_loop()
+    with _loop_lock:
+        if _default_client is None:
+            _default_client = AsyncHttpClient()
+        return _default_client
+
+
+def _close_default_client() -> None:
+    with _loop_lock:
+        client, loop = _default_client, _loop
+    if client is not None and loop is not None and _loop_pid == os.getpid():
+        asyncio.run_coroutine_threadsafe(client.aclose(), loop).result(timeout=5)
+
+
+atexit.register(_close_default_client)
+
+
+def fetch_json_many(
+    requests: Iterable[tuple[str, dict | None]],
+    costs: Iterable[float] | None = None,
+    client: AsyncHttpClient | None = None,
+) -> list[Any]:
+    """
+    Fetch several JSON documents concurrently over one connection pool.
+
+    Args:
+        requests: (url, params) pairs.
+        costs: Rate governor tokens taken by each request (default: 1).
+        client: Client to send the requests with; it is left open. If None,
+            the process-wide client is used.
+
+    Returns:
+        The decoded responses, in the same order as the requests.
+    """
+    client = client or get_default_client()
+    return run_sync(client.get_json_many(list(requests), costs))
+
+
+def fetch_json(
+    url: str, params: dict | None = None, client: AsyncHttpClient | None = None
+) -> Any:
+    return fetch_json_many([(url, params)], client=client)[0]
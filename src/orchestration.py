@@ -1,18 +1,40 @@
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from io import BytesIO
 from pathlib import Path
-from typing import TypedDict
+from typing import NotRequired, TypedDict
 
 import polars as pl
 
-from src.fetch_weather import fetch_weather_history
-from src.file_handling import upload_dataframe, upload_fileobj, download_file
+from src import clean_layer, daily_aggregates, rollups
+from src.background_writer import BackgroundWriter
+from src.fetch_weather import fetch_weather_history, fetch_weather_history_batch
+from src.file_handling import (
+    ExportFormats,
+    copy_object,
+    download_dataframe,
+    download_file,
+    delete_objects_older_than,
+    object_exists,
+    partition_path,
+    upload_dataframe,
+    upload_fileobj,
+    write_object,
+)
 from src.interest_region import Region
-from src.plot_weather import plot_weather
-from src.query_weather import analysis_weather
-from src.transform_weather import transform_weather
+from src.plot_weather import (
+    DEFAULT_PLOT_TARGET,
+    plot_cache_key,
+    plot_weather,
+    plot_weather_batch,
+)
+from src.query_weather import analysis_weather, analysis_weather_by_region
+from src.rate_governor import get_default_governor
+from src.transform_weather import decode_weather_payload
+from src.utils import region_slug
+from src.watermark import read_watermark, watermark_path, write_watermark
 
 
 logger = logging.getLogger(__name__)
@@ -22,68 +44,256 @@ class Result(TypedDict):
     region: str
     date: str
     s3_path: str
+    # Incremental collection state, set when collect is given a state path
+    watermark: NotRequired[str | None]
+    watermark_s3_path: NotRequired[str]
+    # Daily aggregate table, set when transform maintains one, and the first
+    # and last day it recomputed
+    aggregate_s3_path: NotRequired[str]
+    aggregate_days: NotRequired[list[str]]
 
 
-def orchestrate_weather_collect(region: Region, s3_base_path: str) -> Result:
+# ERA5 lags real time by about five days, so a region without a watermark
+# starts far enough back to find published hours.
+DEFAULT_LOOKBACK = timedelta(days=7)
+
+# Format the analysis stage writes; downstream stages read any ExportFormats
+DEFAULT_ANALYSIS_FORMAT = ExportFormats.PARQUET
+
+# Rendered plots, keyed by content hash, under the plot output prefix
+PLOT_CACHE_DIRNAME = "_cache"
+# Cached plots are deleted by the compaction flow this long after they were
+# rendered, hit or not; a plot needed again is then rendered once more
+PLOT_CACHE_RETENTION = timedelta(days=30)
+
+
+def _raw_stem(region_name: str, now: str) -> str:
+    return f"weather_history_{region_name}_{now}"
+
+
+def analysis_path(
+    s3_base_path: str, region_name: str, date: str, format: ExportFormats
+) -> str:
+    """Analysis file of a run, under its region's partition."""
+    prefix = partition_path(s3_base_path, {"region": region_slug(region_name)})
+    return f"{prefix}/weather_history_{region_name}_{date}.{format}"
+
+
+def _upload_raw(raw: bytes, raw_file_path: str) -> None:
+    with BytesIO(raw) as buffer:
+        upload_fileobj(buffer, raw_file_path)
+    logger.info(f"Raw data saved to {raw_file_path}")
+
+
+def _save_raw(region_name: str, data: dict, s3_base_path: str) -> Result:
+    now = f"{datetime.now():%Y%m%d_%H%M}"
+    raw_file_path = f"{s3_base_path}/{_raw_stem(region_name, now)}.json"
+    _upload_raw(json.dumps(data, indent=None).encode("utf-8"), raw_file_path)
+
+    return {
+        "region": region_name,
+        "date": now,
+        "s3_path": raw_file_path,
+    }
+
+
+def _collect_start(watermark: datetime | None, today: datetime) -> datetime:
+    """First day to fetch: the watermark's day, so a gap of any length is filled."""
+    if watermark is None:
+        return today - DEFAULT_LOOKBACK
+    return min(watermark, today)
+
+
+def _read_watermarks(
+    regions: list[Region], state_s3_base_path: str | None
+) -> dict[str, tuple[str, datetime | None]]:
+    if state_s3_base_path is None:
+        return {}
+    watermarks = {}
+    for region in regions:
+        path = watermark_path(state_s3_base_path, region["name"])
+        watermarks[region["name"]] = (path, read_watermark(path))
+    return watermarks
+
+
+def _with_watermark(
+    result: Result, watermarks: dict[str, tuple[str, datetime | None]]
+) -> Result:
+    if result["region"] in watermarks:
+        path, watermark = watermarks[result["region"]]
+        result["watermark_s3_path"] = path
+        result["watermark"] = watermark.isoformat() if watermark else None
+    return result
+
+
+def _log_rate_metrics() -> None:
+    governor = get_default_governor()
+    if governor is None:
+        return
+    metrics = governor.metrics()
+    logger.info(
+        f"Rate limit {metrics['name']!r}: {metrics['waited_seconds']:.1f}s waited "
+        f"over {metrics['requests']} request(s), at most "
+        f"{metrics['max_wait_seconds']:.1f}s at once, "
+        f"throttled {metrics['throttled']} time(s)"
+    )
+
+
+def orchestrate_weather_collect(
+    region: Region,
+    s3_base_path: str,
+    state_s3_base_path: str | None = None,
+) -> Result:
     logger.info(f"Orchestrating weather collect for {region['name']}")
     latitude, longitude = region["latitude"], region["longitude"]
     today = datetime.now()
-    yesterday = today - timedelta(days=1)
+    watermarks = _read_watermarks([region], state_s3_base_path)
+    _, watermark = watermarks.get(region["name"], (None, None))
     data = fetch_weather_history(
         latitude,
         longitude,
-        start_date=yesterday,
+        start_date=_collect_start(watermark, today),
         end_date=today,
     )
     logger.info(f"Weather data fetched for {region['name']}")
+    _log_rate_metrics()
 
-    now = f"{datetime.now():%Y%m%d_%H%M}"
-    stem = f"weather_history_{region['name']}_{now}"
-    raw_file_path = f"{s3_base_path}/{stem}.json"
-    with BytesIO() as buffer:
-        json_str = json.dumps(data, indent=None)
-        buffer.write(json_str.encode("utf-8"))
-        buffer.seek(0)
-        upload_fileobj(buffer, raw_file_path)
-    logger.info(f"Raw data saved to {raw_file_path}")
+    return _with_watermark(_save_raw(region["name"], data, s3_base_path), watermarks)
 
-    return {
-        "region": region["name"],
-        "date": now,
-        "s3_path": raw_file_path,
-    }
+
+def _fetch_batch(
+    regions: list[Region], state_s3_base_path: str | None
+) -> tuple[dict[str, dict], dict[str, tuple[str, datetime | None]]]:
+    today = datetime.now()
+    watermarks = _read_watermarks(regions, state_s3_base_path)
+    # One window for the whole batch: regions that are further ahead get a few
+    # extra (cached) days, which transform drops again using their watermark.
+    start_date = min(
+        (
+            _collect_start(watermarks.get(region["name"], (None, None))[1], today)
+            for region in regions
+        ),
+        default=today,
+    )
+    payloads = fetch_weather_history_batch(
+        regions,
+        start_date=start_date,
+        end_date=today,
+    )
+    logger.info(f"Weather data fetched for {', '.join(payloads)}")
+    _log_rate_metrics()
+    return payloads, watermarks
 
 
-def orchestrate_weather_transform(result: Result, s3_base_path: str) -> Result:
+def orchestrate_weather_collect_batch(
+    regions: list[Region],
+    s3_base_path: str,
+    state_s3_base_path: str | None = None,
+) -> list[Result]:
+    logger.info(f"Orchestrating batched weather collect for {len(regions)} regions")
+    payloads, watermarks = _fetch_batch(regions, state_s3_base_path)
+
+    return [
+        _with_watermark(
+            _save_raw(region["name"], payloads[region["name"]], s3_base_path),
+            watermarks,
+        )
+        for region in regions
+    ]
+
+
+def _new_rows(df: pl.DataFrame, watermark: str | None) -> pl.DataFrame:
+    # ERA5 publishes with a delay: trailing hours of the window are still null
+    df = df.filter(pl.col("temperature_2m").is_not_null())
+    if watermark:
+        df = df.filter(pl.col("time") > datetime.fromisoformat(watermark))
+    return df
+
+
+def _advance_watermark(result: Result, df: pl.DataFrame) -> None:
+    if "watermark_s3_path" in result and not df.is_empty():
+        new_watermark = df["time"].max()
+        if write_watermark(result["watermark_s3_path"], new_watermark):
+            logger.info(f"Watermark for {result['region']} advanced to {new_watermark}")
+        else:
+            logger.info(
+                f"Watermark for {result['region']} already past {new_watermark}"
+            )
+
+
+def orchestrate_weather_transform(
+    result: Result,
+    s3_base_path: str,
+    aggregate_s3_base_path: str | None = None,
+) -> Result:
+    """
+    Merge a raw payload's new hours into the region's clean table.
+
+    If aggregate_s3_base_path (the root of the rollup pyramid) is given, the
+    daily aggregate states of the days touched are recomputed too, so
+    analysis can read them instead of rescanning the clean history.
+    """
     with BytesIO() as buffer:
         download_file(result["s3_path"], buffer)
-        buffer.seek(0)
-        data = json.load(buffer)
-    df = pl.from_dict(data["hourly"])
-    df = transform_weather(df)
-    logger.info(f"Data transformed for {result['s3_path']!r}")
+        df = decode_weather_payload(buffer.getvalue())
+    df = _new_rows(df, result.get("watermark"))
+    logger.info(f"Data transformed for {result['s3_path']!r} ({df.height} new rows)")
 
     stem = Path(result["s3_path"]).stem
-    clean_filename = f"{stem}.parquet"
-    clean_file_path = f"{s3_base_path}/{clean_filename}"
-
-    upload_dataframe(df, clean_file_path)
-    logger.info(f"Transformed data saved to {clean_file_path}")
+    table = clean_layer.table_path(s3_base_path, result["region"])
+    manifest = clean_layer.upsert(table, df, stem)
+    logger.info(f"Transformed data merged into {table} (version {manifest['version']})")
 
-    return {
+    transformed: Result = {
         "region": result["region"],
         "date": result["date"],
-        "s3_path": clean_file_path,
+        "s3_path": table,
     }
+    if aggregate_s3_base_path is not None:
+        aggregate_table = rollups.level_table(
+            aggregate_s3_base_path, "daily", result["region"]
+        )
+        states = daily_aggregates.refresh(aggregate_table, table, df)
+        transformed["aggregate_s3_path"] = aggregate_table
+        if not states.is_empty():
+            transformed["aggregate_days"] = [
+                states["time"].min().isoformat(),
+                states["time"].max().isoformat(),
+            ]
+
+    _advance_watermark(result, df)
+
+    return transformed
+
 
+def orchestrate_weather_analysis(
+    result: Result,
+    s3_base_path: str,
+    approximate: bool = False,
+    format: ExportFormats = DEFAULT_ANALYSIS_FORMAT,
+) -> Result:
+    """
+    Analyze one region, from its daily aggregates if transform keeps them.
 
-def orchestrate_weather_analysis(result: Result, s3_base_path: str) -> Result:
-    df = analysis_weather(result["s3_path"])
+    Like orchestrate_weather_analysis_batch, a region without aggregate
+    states is analyzed by scanning its clean table, and the statistics are
+    written under the region's `region=<slug>` partition of s3_base_path.
+    """
+    states = pl.DataFrame()
+    if "aggregate_s3_path" in result:
+        states = daily_aggregates.read_states(result["aggregate_s3_path"])
+    if states.is_empty():
+        clean_files = clean_layer.list_files(result["s3_path"])
+        df = analysis_weather(
+            [file["path"] for file in clean_files], approximate=approximate
+        )
+    else:
+        df = daily_aggregates.finalize(states)
     logger.info(f"Data analyzed for {result["s3_path"]!r}")
 
-    stem = Path(result["s3_path"]).stem
-    analysis_filename = f"{stem}.csv"
-    analysis_file_path = f"{s3_base_path}/{analysis_filename}"
+    analysis_file_path = analysis_path(
+        s3_base_path, result["region"], result["date"], format
+    )
     upload_dataframe(df, analysis_file_path)
     logger.info(f"Analyzed data saved to {analysis_file_path}")
 
@@ -94,20 +304,384 @@ def orchestrate_weather_analysis(result: Result, s3_base_path: str) -> Result:
     }
 
 
-def orchestrate_weather_plot(result: Result, s3_base_path: str) -> Result:
-    df = pl.read_csv(result["s3_path"])
-    logger.info(f"Data plotted for {result["s3_path"]!r}")
+def _analyze_clean(
+    results: list[Result], max_workers: int, approximate: bool
+) -> dict[str, pl.DataFrame]:
+    """Daily statistics of each region's clean table, from a single scan."""
+    with ThreadPoolExecutor(max_workers) as executor:
+        clean_files = executor.map(
+            clean_layer.list_files, [result["s3_path"] for result in results]
+        )
+        paths = [file["path"] for files in clean_files for file in files]
+    if not paths:
+        return {}
+    df = analysis_weather_by_region(paths, approximate=approximate)
+    partitions = df.partition_by(
+        "region", as_dict=True, include_key=False, maintain_order=True
+    )
+    logger.info(f"Data analyzed for {len(partitions)} regions in a single scan")
+    return {slug: partition for (slug,), partition in partitions.items()}
+
+
+def _analyze_aggregates(
+    results: list[Result], max_workers: int
+) -> dict[str, pl.DataFrame]:
+    """Daily statistics of each region, finalized from its aggregate table."""
+    with ThreadPoolExecutor(max_workers) as executor:
+        states = executor.map(
+            daily_aggregates.read_states,
+            [result["aggregate_s3_path"] for result in results],
+        )
+        analyses = {
+            region_slug(result["region"]): daily_aggregates.finalize(region_states)
+            for result, region_states in zip(results, states, strict=True)
+            if not region_states.is_empty()
+        }
+    logger.info(f"Data analyzed for {len(analyses)} regions from daily aggregates")
+    return analyses
+
+
+def orchestrate_weather_analysis_batch(
+    results: list[Result],
+    s3_base_path: str,
+    max_writers: int = 4,
+    approximate: bool = False,
+    format: ExportFormats = DEFAULT_ANALYSIS_FORMAT,
+) -> list[Result]:
+    """
+    Analyze every region at once.
+
+    Regions whose transform maintains a daily aggregate table are finalized
+    from their stored states; the others are computed from their clean tables
+    with a single query grouped by region and day. Each region's statistics
+    are written under its own `region=<slug>` partition of s3_base_path.
+
+    Args:
+        results: Transform results, whose s3_path is the region's table.
+        s3_base_path: Root of the analysis dataset.
+        max_writers: Number of tables read and partitions uploaded
+            concurrently.
+        approximate: Estimate median and mode when scanning clean tables,
+            see analysis_weather. Aggregate tables are always exact.
+        format: Format of the analysis files; Parquet and Arrow keep the
+            column types, so readers need not parse them.
+
+    Returns:
+        One result per region that has clean data.
+    """
+    analyses = _analyze_clean(
+        [result for result in results if "aggregate_s3_path" not in result],
+        max_writers,
+        approximate,
+    ) | _analyze_aggregates(
+        [result for result in results if "aggregate_s3_path" in result],
+        max_writers,
+    )
+    if not analyses:
+        logger.info("No clean data to analyze")
+        return []
+
+    analysis_results = []
+    with BackgroundWriter(max_writers) as writer:
+        for result in results:
+            slug = region_slug(result["region"])
+            if slug not in analyses:
+                continue
+            analysis_file_path = analysis_path(
+                s3_base_path, result["region"], result["date"], format
+            )
+            writer.submit(upload_dataframe, analyses[slug], analysis_file_path)
+            analysis_results.append(
+                {
+                    "region": result["region"],
+                    "date": result["date"],
+                    "s3_path": analysis_file_path,
+                }
+            )
+    logger.info(f"Analyzed data saved under {s3_base_path}")
+    return analysis_results
+
+
+def _commit_clean(
+    table: str,
+    plan: clean_layer.UpsertPlan,
+    stem: str,
+    result: Result,
+    df: pl.DataFrame,
+    aggregate: tuple[str, pl.DataFrame] | None = None,
+) -> None:
+    if plan["rows"].is_empty():
+        return
+    manifest = clean_layer.apply_upsert(table, plan, stem)
+    logger.info(f"Transformed data merged into {table} (version {manifest['version']})")
+    if aggregate is not None:
+        aggregate_s3_base_path, states = aggregate
+        aggregate_table = rollups.level_table(
+            aggregate_s3_base_path, "daily", result["region"]
+        )
+        states = daily_aggregates.merge(aggregate_table, table, states)
+        if not states.is_empty():
+            rollups.rollup(
+                aggregate_s3_base_path,
+                result["region"],
+                states["time"].min(),
+                states["time"].max(),
+            )
+    _advance_watermark(result, df)
+
+
+def _analyze_history(
+    table: str,
+    region_name: str,
+    touched: pl.DataFrame,
+    days: tuple[datetime, datetime],
+    aggregate: tuple[str, pl.DataFrame] | None = None,
+) -> pl.DataFrame:
+    """
+    Daily statistics of a region's whole history, before its commit lands.
+
+    The touched days are computed from their merged rows, the others from
+    the committed daily states if aggregate (the root of the rollup pyramid
+    and the touched days' states) is given, or else from the clean table.
+    """
+    first_day, last_day = days
+    if aggregate is not None:
+        aggregate_s3_base_path, states = aggregate
+        committed = daily_aggregates.read_states(
+            rollups.level_table(aggregate_s3_base_path, "daily", region_name)
+        )
+        # An empty aggregate table is built from the clean history on commit
+        if not committed.is_empty():
+            states = pl.concat(
+                [
+                    committed.filter(~pl.col("time").is_between(first_day, last_day)),
+                    states,
+                ],
+                how="diagonal_relaxed",
+            )
+            return daily_aggregates.finalize(states)
+
+    analysis = analysis_weather(touched)
+    clean_files = clean_layer.list_files(table)
+    if clean_files:
+        history = analysis_weather([file["path"] for file in clean_files])
+        is_touched = pl.col("day").is_between(first_day.date(), last_day.date())
+        analysis = pl.concat(
+            [history.filter(~is_touched), analysis], how="vertical_relaxed"
+        ).sort("day", descending=True)
+    return analysis
+
+
+def orchestrate_weather_pipeline(
+    regions: list[Region],
+    raw_s3_base_path: str,
+    clean_s3_base_path: str,
+    analysis_s3_base_path: str,
+    state_s3_base_path: str | None = None,
+    max_writers: int = 4,
+    aggregate_s3_base_path: str | None = None,
+    analysis_format: ExportFormats = DEFAULT_ANALYSIS_FORMAT,
+) -> list[Result]:
+    """
+    Run collect -> transform -> analysis in memory (fused mode).
+
+    The fetched payloads are decoded and analyzed without the raw S3
+    round-trip; raw, clean and analysis objects are persisted by a background
+    writer while the next region is processed. Like the staged modes,
+    analysis covers the region's whole history: the merged rows of the days
+    touched stand in for their committed ones, which the background commit
+    may not have replaced yet. Raw objects are still written, so the staged
+    transform can replay them. If aggregate_s3_base_path is given, the daily
+    aggregate states of the touched days are committed after the clean rows
+    and rolled up into weeks, months and years, and analysis is finalized
+    from those states. Analysis files are written in analysis_format, under
+    the same `region=<slug>` partitions as the staged modes.
+
+    Returns:
+        One analysis result per region, once every write has completed.
+    """
+    logger.info(f"Orchestrating fused weather pipeline for {len(regions)} regions")
+    payloads, watermarks = _fetch_batch(regions, state_s3_base_path)
+    now = f"{datetime.now():%Y%m%d_%H%M}"
+
+    results = []
+    with BackgroundWriter(max_writers) as writer:
+        for region in regions:
+            stem = _raw_stem(region["name"], now)
+            raw_file_path = f"{raw_s3_base_path}/{stem}.json"
+            result = _with_watermark(
+                {"region": region["name"], "date": now, "s3_path": raw_file_path},
+                watermarks,
+            )
+            raw = json.dumps(payloads[region["name"]], indent=None).encode("utf-8")
+            writer.submit(_upload_raw, raw, raw_file_path)
+
+            df = _new_rows(decode_weather_payload(raw), result.get("watermark"))
+            logger.info(f"Data transformed for {region['name']} ({df.height} new rows)")
+            if df.is_empty():
+                continue
+
+            # Merge whole days, so the analysis below sees complete days
+            table = clean_layer.table_path(clean_s3_base_path, region["name"])
+            first_day = df["time"].min().replace(hour=0, minute=0, second=0)
+            last_day = df["time"].max().replace(hour=23, minute=59, second=59)
+            plan = clean_layer.plan_upsert(table, df, (first_day, last_day))
+            touched = plan["rows"].filter(
+                pl.col("time").is_between(first_day, last_day)
+            )
+            aggregate = None
+            if aggregate_s3_base_path is not None:
+                aggregate = (
+                    aggregate_s3_base_path,
+                    daily_aggregates.daily_state(touched),
+                )
+            analysis = _analyze_history(
+                table, region["name"], touched, (first_day, last_day), aggregate
+            )
+            writer.submit(_commit_clean, table, plan, stem, result, df, aggregate)
+
+            analysis_file_path = analysis_path(
+                analysis_s3_base_path, region["name"], now, analysis_format
+            )
+            writer.submit(upload_dataframe, analysis, analysis_file_path)
+            results.append(
+                {"region": region["name"], "date": now, "s3_path": analysis_file_path}
+            )
+
+    return results
+
+
+def orchestrate_weather_rollup(
+    result: Result, aggregate_s3_base_path: str
+) -> list[rollups.RollupReport]:
+    """Roll the days recomputed by transform up into weeks, months and years."""
+    first_day, last_day = (
+        [datetime.fromisoformat(day) for day in result["aggregate_days"]]
+        if "aggregate_days" in result
+        else (None, None)
+    )
+    reports = rollups.rollup(
+        aggregate_s3_base_path, result["region"], first_day, last_day
+    )
+    logger.info(
+        f"Rolled up {result['region']}: "
+        + (", ".join(f"{r['periods']} {r['level']}" for r in reports) or "no changes")
+    )
+    return reports
+
+
+def _plot_ctx(result: Result) -> dict[str, str]:
+    # The run's day rather than its minute, so reruns of unchanged data
+    # render the same image and hit the plot cache
+    day = datetime.strptime(result["date"][:8], "%Y%m%d")
+    return {"region": result["region"], "date": f"{day:%Y-%m-%d}"}
+
+
+def _plot_cache_path(s3_base_path: str, key: str) -> str:
+    return f"{s3_base_path}/{PLOT_CACHE_DIRNAME}/{key}.png"
+
+
+def orchestrate_weather_plot(
+    result: Result, s3_base_path: str, target: str = DEFAULT_PLOT_TARGET
+) -> Result:
+    df = download_dataframe(result["s3_path"])
+    plot_ctx = _plot_ctx(result)
 
     stem = Path(result["s3_path"]).stem
     plot_filename = f"{stem}.png"
     plot_file_path = f"{s3_base_path}/{plot_filename}"
-    with BytesIO() as output_file:
-        plot_weather(df.to_pandas(), result, output_file)
-        output_file.seek(0)
-        upload_fileobj(output_file, plot_file_path)
+    cache_path = _plot_cache_path(s3_base_path, plot_cache_key(df, plot_ctx, target))
+    if object_exists(cache_path):
+        logger.info(f"Plot for {result['s3_path']!r} is cached, not rendered")
+    else:
+        with BytesIO() as output_file:
+            plot_weather(df, plot_ctx, output_file, target)
+            write_object(output_file.getvalue(), cache_path)
+        logger.info(f"Data plotted for {result["s3_path"]!r}")
+    copy_object(cache_path, plot_file_path)
     logger.info(f"Plotted data saved to {plot_file_path}")
 
     return {
         "region": result["region"],
         "s3_path": plot_file_path,
     }
+
+
+def orchestrate_weather_plot_batch(
+    results: list[Result],
+    s3_base_path: str,
+    target: str = DEFAULT_PLOT_TARGET,
+    max_workers: int | None = None,
+    max_transfers: int = 4,
+) -> list[Result]:
+    """
+    Plot every region's analysis, rendering in a process pool.
+
+    Analysis files are downloaded and plots uploaded by threads, while the
+    CPU-bound rendering is spread over max_workers processes. Plots are
+    cached in S3 under a hash of their data and configuration; a plot whose
+    hash is already cached is copied server-side instead of rendered. Cached
+    plots are kept for PLOT_CACHE_RETENTION, see
+    orchestrate_weather_plot_cache_prune.
+    """
+
+    plot_ctxs = [_plot_ctx(result) for result in results]
+    with ThreadPoolExecutor(max_transfers) as executor:
+        frames = list(
+            executor.map(download_dataframe, [result["s3_path"] for result in results])
+        )
+        cache_paths = [
+            _plot_cache_path(s3_base_path, plot_cache_key(df, plot_ctx, target))
+            for df, plot_ctx in zip(frames, plot_ctxs, strict=True)
+        ]
+        cached = list(executor.map(object_exists, cache_paths))
+
+    # Several regions may share an image; render each one once
+    misses = {
+        path: (df, plot_ctx)
+        for df, plot_ctx, path, hit in zip(
+            frames, plot_ctxs, cache_paths, cached, strict=True
+        )
+        if not hit
+    }
+    images = plot_weather_batch(
+        list(misses.values()), target=target, max_workers=max_workers
+    )
+    logger.info(
+        f"Rendered {len(images)} plot(s) for {len(results)} regions, "
+        f"{sum(cached)} served from the plot cache"
+    )
+
+    with ThreadPoolExecutor(max_transfers) as executor:
+        list(executor.map(write_object, images, misses))
+
+    plot_results = []
+    with BackgroundWriter(max_transfers) as writer:
+        for result, cache_path in zip(results, cache_paths, strict=True):
+            plot_file_path = f"{s3_base_path}/{Path(result['s3_path']).stem}.png"
+            writer.submit(copy_object, cache_path, plot_file_path)
+            plot_results.append({"region": result["region"], "s3_path": plot_file_path})
+    return plot_results
+
+
+def orchestrate_weather_compaction(
+    region: Region, s3_base_path: str
+) -> clean_layer.CompactionReport:
+    table = clean_layer.table_path(s3_base_path, region["name"])
+    report = clean_layer.compact(table)
+    logger.info(
+        f"Compacted {table}: {report['files_removed']} file(s) -> "
+        f"{report['files_added']}, {report['rows_before']} -> "
+        f"{report['rows_after']} rows"
+    )
+    return report
+
+
+def orchestrate_weather_plot_cache_prune(
+    s3_base_path: str, retention: timedelta = PLOT_CACHE_RETENTION
+) -> int:
+    """Delete the cached plots under s3_base_path older than retention."""
+    cache_prefix = f"{s3_base_path}/{PLOT_CACHE_DIRNAME}/"
+    deleted = delete_objects_older_than(cache_prefix, retention)
+    logger.info(f"Pruned {deleted} cached plot(s) from {cache_prefix}")
+    return deleted
@@ -1,8 +1,24 @@
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
-from typing import TypedDict
+from typing import TYPE_CHECKING, BinaryIO, TypedDict
 
-import matplotlib.pyplot as plt
-import pandas as pd
+import matplotlib
+import numpy as np
+from matplotlib.axes import Axes
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import polars as pl
+    import pyarrow as pa
+
+    # Analysis data: anything whose columns, by name, have a to_numpy()
+    PlotFrame = pl.DataFrame | pa.Table | pd.DataFrame
 
 
 class PlotConfig(TypedDict):
@@ -21,18 +37,62 @@ class PlotConfig(TypedDict):
     ylabel: str
 
 
-def plot_variable(ax: plt.Axes, df: pd.DataFrame, config: PlotConfig) -> plt.Axes:
+class PlotTarget(TypedDict):
+    width: float
+    height: float
+    dpi: int
+
+
+# Figure size (inches) and resolution of each output target
+PLOT_TARGETS: dict[str, PlotTarget] = {
+    "print": {"width": 9, "height": 12, "dpi": 300},
+    "web": {"width": 9, "height": 12, "dpi": 100},
+    "thumbnail": {"width": 6, "height": 8, "dpi": 50},
+}
+DEFAULT_PLOT_TARGET = "print"
+
+# Part of every plot cache key; bump it when the rendering changes
+PLOT_VERSION = 1
+
+TIME_COLUMN = "day"
+# Columns drawn by plot_weather, besides the time column
+PLOTTED_COLUMNS = [
+    f"{statistic}_{name}"
+    for name in ("temp", "windspeed", "relative_humidity")
+    for statistic in ("avg", "max", "min")
+]
+
+
+def _column(df: "PlotFrame", name: str) -> np.ndarray:
+    """
+    A column as a NumPy array, without copying when the layout allows it.
+
+    Polars and Arrow numeric columns without nulls are returned as views of
+    their buffers; a time column is returned as datetime64, parsing it only
+    when it holds strings (e.g. pandas read from CSV).
+    """
+    values = df[name].to_numpy()
+    if name == TIME_COLUMN and values.dtype.kind != "M":
+        values = values.astype("datetime64[D]")
+    return values
+
+
+def plot_variable(ax: Axes, df: "PlotFrame", config: PlotConfig) -> Axes:
+    time = _column(df, config["time_var_name"])
+    main = _column(df, config["main_var_name"])
+    maximum = _column(df, config["max_var_name"])
+    minimum = _column(df, config["min_var_name"])
     ax.plot(
-        df[config["time_var_name"]],
-        df[config["main_var_name"]],
+        time,
+        main,
         label=config["main_var_label"],
         color=config["main_var_color"],
         marker="o",
         linewidth=2,
     )
     ax.plot(
-        df[config["time_var_name"]],
-        df[config["max_var_name"]],
+        time,
+        maximum,
         label=config["max_var_label"],
         color=config["max_var_color"],
         marker="^",
@@ -40,8 +100,8 @@ def plot_variable(ax: plt.Axes, df: pd.DataFrame, config: PlotConfig) -> plt.Axe
         alpha=0.7,
     )
     ax.plot(
-        df[config["time_var_name"]],
-        df[config["min_var_name"]],
+        time,
+        minimum,
         label=config["min_var_label"],
         color=config["min_var_color"],
         marker="v",
@@ -49,9 +109,9 @@ def plot_variable(ax: plt.Axes, df: pd.DataFrame, config: PlotConfig) -> plt.Axe
         alpha=0.7,
     )
     ax.fill_between(
-        df[config["time_var_name"]],
-        df[config["min_var_name"]],
-        df[config["max_var_name"]],
+        time,
+        minimum,
+        maximum,
         alpha=0.2,
         color=config["main_var_color"],
     )
@@ -65,23 +125,35 @@ def plot_variable(ax: plt.Axes, df: pd.DataFrame, config: PlotConfig) -> plt.Axe
 
 
 def plot_weather(
-    df: pd.DataFrame,
+    df: "PlotFrame",
     plot_ctx: dict[str, str],
-    output_file: BytesIO,
+    output_file: BinaryIO,
+    target: str = DEFAULT_PLOT_TARGET,
 ) -> None:
     """
     Plot weather data from a dataframe and save to the specified output path.
 
+    The figure is drawn with matplotlib's object-oriented API on its own Agg
+    canvas, without pyplot's global state, so it is safe to call from
+    several threads or processes at once.
+
+    Columns are handed to matplotlib as NumPy arrays, viewing Polars and
+    Arrow buffers directly, so no pandas conversion is needed.
+
     Args:
-        df: DataFrame containing weather analysis data with columns like
-            day, avg_temp, min_temp, max_temp, avg_windspeed, avg_relative_humidity, etc.
+        df: Polars DataFrame, Arrow table or pandas DataFrame containing
+            weather analysis data with columns like day, avg_temp, min_temp,
+            max_temp, avg_windspeed, avg_relative_humidity, etc. It is not
+            modified.
         output_path: Path where the plot image will be saved (should be .png)
+        target: Output target, a key of PLOT_TARGETS (size and DPI).
     """
-    # Convert day column to datetime if it's not already
-    df["day"] = pd.to_datetime(df["day"])
+    size = PLOT_TARGETS[target]
 
     # Create figure with subplots
-    fig, axes = plt.subplots(3, 1, figsize=(9, 12), dpi=200, sharex=True)
+    fig = Figure(figsize=(size["width"], size["height"]), dpi=size["dpi"])
+    FigureCanvasAgg(fig)
+    axes = fig.subplots(3, 1, sharex=True)
     fig.suptitle(
         f"Weather Prediction for {plot_ctx['region']} on {plot_ctx['date']}",
         fontsize=16,
@@ -91,7 +163,7 @@ def plot_weather(
     # Plot 1: Temperature (avg, min, max)
     ax1 = axes[0]
     plot_config = {
-        "time_var_name": "day",
+        "time_var_name": TIME_COLUMN,
         "main_var_name": "avg_temp",
         "max_var_name": "max_temp",
         "min_var_name": "min_temp",
@@ -110,7 +182,7 @@ def plot_weather(
     # Plot 2: Wind Speed
     ax2 = axes[1]
     plot_config = {
-        "time_var_name": "day",
+        "time_var_name": TIME_COLUMN,
         "main_var_name": "avg_windspeed",
         "max_var_name": "max_windspeed",
         "min_var_name": "min_windspeed",
@@ -129,7 +201,7 @@ def plot_weather(
     # Plot 3: Relative Humidity
     ax3 = axes[2]
     plot_config = {
-        "time_var_name": "day",
+        "time_var_name": TIME_COLUMN,
         "main_var_name": "avg_relative_humidity",
         "max_var_name": "max_relative_humidity",
         "min_var_name": "min_relative_humidity",
@@ -146,8 +218,88 @@ def plot_weather(
     plot_variable(ax3, df, plot_config)
 
     # Adjust layout to prevent overlap
-    plt.tight_layout()
+    fig.tight_layout()
 
     # Save the plot
-    plt.savefig(output_file, dpi=300, bbox_inches="tight")
-    plt.close()
+    fig.savefig(output_file, dpi=size["dpi"], bbox_inches="tight")
+
+
+def plot_cache_key(
+    df: "PlotFrame", plot_ctx: dict[str, str], target: str = DEFAULT_PLOT_TARGET
+) -> str:
+    """
+    Content hash of everything a plot depends on.
+
+    Covers the values of the plotted columns, the title fields of the
+    context, the target's size and DPI, and the rendering code (PLOT_VERSION
+    and the matplotlib version), so equal keys render identical images.
+    Values are hashed as datetime64 days and float64, so the same values get
+    the same key whichever kind of frame holds them; text formats must be
+    parsed exactly for that, e.g. pandas' read_csv with
+    float_precision="round_trip".
+    """
+    config = [
+        PLOT_VERSION,
+        matplotlib.__version__,
+        plot_ctx["region"],
+        plot_ctx["date"],
+        PLOT_TARGETS[target],
+        [TIME_COLUMN, *PLOTTED_COLUMNS],
+    ]
+    digest = hashlib.sha256(json.dumps(config).encode("utf-8"))
+    digest.update(_column(df, TIME_COLUMN).astype("datetime64[D]").tobytes())
+    for name in PLOTTED_COLUMNS:
+        digest.update(np.ascontiguousarray(_column(df, name), np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def render_weather_plot(
+    df: "PlotFrame", plot_ctx: dict[str, str], target: str = DEFAULT_PLOT_TARGET
+) -> bytes:
+    """Render a plot to PNG bytes; picklable, for use in worker processes."""
+    with BytesIO() as output_file:
+        plot_weather(df, plot_ctx, output_file, target)
+        return output_file.getvalue()
+
+
+def _plot_pool(max_workers: int | None) -> ProcessPoolExecutor:
+    # Forking a threaded parent (Prefect, boto3 pools) may deadlock, so
+    # workers are forked from a forkserver instead. It imports this module
+    # and matplotlib once, rather than every worker doing it on start; the
+    # caller's __main__ is not preloaded, as it may run work on import.
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload([__name__])
+    return ProcessPoolExecutor(max_workers, mp_context=context)
+
+
+def plot_weather_batch(
+    plots: list[tuple["PlotFrame", dict[str, str]]],
+    target: str = DEFAULT_PLOT_TARGET,
+    max_workers: int | None = None,
+) -> list[bytes]:
+    """
+    Render several plots in parallel, one process per CPU core.
+
+    Rendering is CPU-bound and matplotlib holds the GIL while drawing, so
+    the plots are spread over a process pool rather than threads.
+
+    Args:
+        plots: Analysis data and plot context of every plot.
+        target: Output target of every plot, a key of PLOT_TARGETS.
+        max_workers: Number of worker processes (default: CPU count).
+
+    Returns:
+        The PNG bytes of every plot, in input order.
+    """
+    max_workers = min(max_workers or os.cpu_count() or 1, len(plots))
+    if max_workers <= 1:
+        return [render_weather_plot(df, ctx, target) for df, ctx in plots]
+    with _plot_pool(max_workers) as executor:
+        return list(
+            executor.map(
+                render_weather_plot,
+                [df for df, _ in plots],
+                [ctx for _, ctx in plots],
+                [target] * len(plots),
+            )
+        )
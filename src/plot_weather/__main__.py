@@ -1,45 +1,173 @@
+import os
+import re
+import shutil
 from datetime import datetime
+from glob import glob as glob_paths
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import pandas as pd
 import typer
 
-from . import plot_weather
+from src.file_handling import ExportFormats, read_dataframe
+
+from . import DEFAULT_PLOT_TARGET, PLOT_TARGETS, plot_cache_key, plot_weather_batch
+
+if TYPE_CHECKING:
+    from . import PlotFrame
 
 app = typer.Typer(help="Plot weather data")
 
+# `[weather_history_]<name>_<YYYYMMDD>[_<HHMM>]`, as written by the analysis
+ANALYSIS_STEM = re.compile(
+    r"(?:weather_history_)?(?P<name>.+)_(?P<date>\d{8})(?:_\d{4})?"
+)
+
 
 def extract_name_and_date(analysis_filepath: str) -> tuple[str, str]:
     stem = Path(analysis_filepath).stem
-    *_, name, date = stem.split("_")
+    match = ANALYSIS_STEM.fullmatch(stem)
+    if match is None:
+        *_, name, date = stem.split("_")
+    else:
+        name, date = match["name"], match["date"]
     return name, datetime.strptime(date, "%Y%m%d").strftime("%Y-%m-%d")
 
 
+def _default_output(name: str, date: str) -> str:
+    return f"weather_plot_{name}_{date}.png"
+
+
+def _read_analysis(analysis_filepath: str) -> "PlotFrame":
+    # CSV keeps going through pandas; typed formats are memory-mapped. The
+    # default float parser may be off by an ulp, which would change the plot
+    # cache key of the same data
+    if Path(analysis_filepath).suffix == f".{ExportFormats.CSV}":
+        return pd.read_csv(analysis_filepath, float_precision="round_trip")
+    return read_dataframe(analysis_filepath)
+
+
+def _is_analysis_file(filepath: str) -> bool:
+    return Path(filepath).suffix.removeprefix(".") in list(ExportFormats)
+
+
+def _render(
+    plots: list[tuple["PlotFrame", dict[str, str]]],
+    outputs: list[Path],
+    target: str,
+    workers: int | None,
+    cache_dir: Path | None,
+) -> int:
+    """Write every plot, rendering only those missing from the cache."""
+    if cache_dir is None:
+        cached = [None] * len(plots)
+    else:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        cached = [
+            cache_dir / f"{plot_cache_key(df, plot_ctx, target)}.png"
+            for df, plot_ctx in plots
+        ]
+    misses = [
+        i
+        for i, cache_path in enumerate(cached)
+        if not (cache_path and cache_path.exists())
+    ]
+    images = plot_weather_batch(
+        [plots[i] for i in misses], target=target, max_workers=workers
+    )
+    for i, image in zip(misses, images, strict=True):
+        outputs[i].write_bytes(image)
+        if cached[i] is not None:
+            tmp_path = cached[i].with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_bytes(image)
+            os.replace(tmp_path, cached[i])
+    rendered = set(misses)
+    for i, cache_path in enumerate(cached):
+        if i not in rendered:
+            shutil.copyfile(cache_path, outputs[i])
+    return len(images)
+
+
 @app.command()
 def main(
-    analysis_filepath: str = typer.Argument(..., help="Path to the analysis data file"),
+    analysis_filepath: str | None = typer.Argument(
+        None,
+        help=(
+            "Path to the analysis data file (CSV, Parquet, Arrow or Feather), "
+            "or a directory of them"
+        ),
+    ),
     output: str | None = typer.Option(
         None,
         "--output",
         "-o",
-        help="Path to the plot data file (default: weather_plot_{name}_{date}.png)",
+        help=(
+            "Path to the plot data file (default: weather_plot_{name}_{date}.png); "
+            "in batch mode, the directory the plots are written to"
+        ),
+    ),
+    glob: str | None = typer.Option(
+        None, "--glob", help="Plot every analysis file matching this pattern"
+    ),
+    target: str = typer.Option(
+        DEFAULT_PLOT_TARGET,
+        "--target",
+        "-t",
+        help=f"Output size and DPI: {', '.join(PLOT_TARGETS)}",
+    ),
+    workers: int | None = typer.Option(
+        None, "--workers", "-w", help="Rendering processes (default: CPU count)"
+    ),
+    cache_dir: Path | None = typer.Option(
+        None,
+        "--cache-dir",
+        help="Reuse plots rendered before from identical data and settings",
     ),
 ) -> None:
-    name, date = extract_name_and_date(analysis_filepath)
-    plot_ctx = {"region": name, "date": date}
+    if target not in PLOT_TARGETS:
+        raise typer.BadParameter(f"Unknown target {target!r}", param_hint="--target")
+
+    if glob is None and analysis_filepath is not None:
+        if Path(analysis_filepath).is_dir():
+            glob = str(Path(analysis_filepath) / "*")
+
+    if glob is None:
+        if analysis_filepath is None:
+            raise typer.BadParameter("Give an analysis file, a directory or --glob")
+        name, date = extract_name_and_date(analysis_filepath)
+        plot_ctx = {"region": name, "date": date}
+
+        if output is None:
+            output = _default_output(name, date)
+
+        df = _read_analysis(analysis_filepath)
+
+        _render([(df, plot_ctx)], [Path(output)], target, workers, cache_dir)
+        typer.echo(f"Plot saved to {output}")
+        return
 
-    if output is None:
-        output = f"weather_plot_{name}_{date}.png"
+    analysis_filepaths = sorted(
+        filter(_is_analysis_file, glob_paths(glob, recursive=True))
+    )
+    if not analysis_filepaths:
+        typer.echo(f"No analysis files match {glob}")
+        raise typer.Exit(1)
 
-    df = pd.read_csv(analysis_filepath)
+    output_dir = Path(output or ".")
+    output_dir.mkdir(parents=True, exist_ok=True)
+    plots = []
+    outputs = []
+    for filepath in analysis_filepaths:
+        name, date = extract_name_and_date(filepath)
+        plots.append((_read_analysis(filepath), {"region": name, "date": date}))
+        # Named after the analysis file, as several may share a region and day
+        outputs.append(output_dir / f"{Path(filepath).stem}.png")
 
-    with open(output, "wb") as output_file:
-        plot_weather(
-            df=df,
-            plot_ctx=plot_ctx,
-            output_file=output_file,
-        )
-    typer.echo(f"Plot saved to {output}")
+    rendered = _render(plots, outputs, target, workers, cache_dir)
+    typer.echo(
+        f"{len(outputs)} plot(s) saved to {output_dir} ({rendered} rendered, "
+        f"{len(outputs) - rendered} from cache)"
+    )
 
 
 if __name__ == "__main__":
@@ -1,18 +1,217 @@
+import logging
 import os
+import threading
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
 from textwrap import dedent
+from typing import TypedDict
 
 import duckdb
+import polars as pl
 
+from src import clean_layer
+from src.file_handling import duckdb_s3_config
+from src.interest_region import REGIONS
 
-def analysis_weather(s3_path: str):
-    query = dedent(
+
+logger = logging.getLogger(__name__)
+
+
+# Both default to DuckDB's own choice (all cores, 80% of RAM) when unset
+DUCKDB_THREADS = os.getenv("DUCKDB_THREADS")
+DUCKDB_MEMORY_LIMIT = os.getenv("DUCKDB_MEMORY_LIMIT")
+
+# duckdb_s3_config() setting -> CREATE SECRET parameter
+_SECRET_PARAMETERS = {
+    "s3_access_key_id": "KEY_ID",
+    "s3_secret_access_key": "SECRET",
+    "s3_session_token": "SESSION_TOKEN",
+    "s3_region": "REGION",
+    "s3_endpoint": "ENDPOINT",
+    "s3_use_ssl": "USE_SSL",
+    "s3_url_style": "URL_STYLE",
+}
+
+
+class AnalysisEngine:
+    """
+    Long-lived DuckDB connection configured once for querying the clean layer.
+
+    httpfs is loaded and S3 access is set up as a secret when the engine is
+    created, and HTTP metadata and Parquet footer caching are enabled, so
+    repeated scans of the same objects skip the HEAD requests and footer
+    reads. Every query runs on its own cursor, which shares the database and
+    its caches but not statement state, so one engine can be used from
+    several threads at once.
+
+    Args:
+        threads: DuckDB worker threads; None keeps DuckDB's default.
+        memory_limit: DuckDB memory limit, e.g. "2GB"; None keeps the default.
+    """
+
+    def __init__(self, threads: int | None = None, memory_limit: str | None = None):
+        config: dict[str, str | int | bool] = {
+            "enable_http_metadata_cache": True,
+            "enable_object_cache": True,
+        }
+        if threads is not None:
+            config["threads"] = threads
+        if memory_limit is not None:
+            config["memory_limit"] = memory_limit
+        self._conn = duckdb.connect(config=config)
+        self._conn.execute("LOAD httpfs")
+        # Most frequent key of a histogram() map; keys are sorted, so the
+        # smallest one wins ties
+        self._conn.execute(
+            "CREATE MACRO histogram_mode(h) AS "
+            "map_keys(h)[list_position(map_values(h), list_max(map_values(h)))]"
+        )
+        self._lock = threading.Lock()
+        self._s3_config: dict | None = None
+        self._refresh_secret()
+
+    def _refresh_secret(self) -> None:
+        """(Re)create the S3 secret whenever the session credentials rotate."""
+        s3_config = duckdb_s3_config()
+        if s3_config == self._s3_config:
+            return
+        with self._lock:
+            if s3_config == self._s3_config:
+                return
+            parameters = ["TYPE s3"] + [
+                f"{_SECRET_PARAMETERS[name]} {_sql_literal(value)}"
+                for name, value in s3_config.items()
+            ]
+            self._conn.execute(
+                f"CREATE OR REPLACE SECRET clean_layer ({', '.join(parameters)})"
+            )
+            self._s3_config = s3_config
+
+    @contextmanager
+    def cursor(self) -> Iterator[duckdb.DuckDBPyConnection]:
+        """A thread-private cursor over the shared database."""
+        self._refresh_secret()
+        with self._conn.cursor() as cursor:
+            yield cursor
+
+    def query(
+        self,
+        sql: str,
+        tables: dict[str, pl.DataFrame] | None = None,
+    ) -> pl.DataFrame:
+        """
+        Run a query and fetch the result as a Polars DataFrame.
+
+        Args:
+            sql: Query to run.
+            tables: In-memory frames to expose to the query under the given
+                names. They are only visible to this query.
+        """
+        with self.cursor() as cursor:
+            for name, df in (tables or {}).items():
+                cursor.register(name, df.to_arrow())
+            return cursor.execute(sql).pl()
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def _sql_literal(value: str | bool) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return "'" + value.replace("'", "''") + "'"
+
+
+_engine_lock = threading.Lock()
+_engine: AnalysisEngine | None = None
+_engine_pid: int | None = None
+
+
+def get_analysis_engine() -> AnalysisEngine:
+    """
+    Process-wide analysis engine, reused across regions and flow runs.
+
+    Built once per process, under a lock, with DUCKDB_THREADS and
+    DUCKDB_MEMORY_LIMIT as limits. A forked child builds its own engine.
+    """
+    global _engine, _engine_pid
+
+    if _engine is not None and _engine_pid == os.getpid():
+        return _engine
+    with _engine_lock:
+        if _engine is None or _engine_pid != os.getpid():
+            _engine = AnalysisEngine(
+                threads=int(DUCKDB_THREADS) if DUCKDB_THREADS else None,
+                memory_limit=DUCKDB_MEMORY_LIMIT,
+            )
+            _engine_pid = os.getpid()
+    return _engine
+
+
+# Bin width, in each variable's unit, of the histogram approximating the mode
+APPROXIMATE_MODE_BIN_WIDTH = {
+    "temperature_2m": 0.5,
+    "windspeed_10m": 1.0,
+    "relative_humidity_2m": 1.0,
+}
+
+
+def _read_clean_files(s3_paths: str | list[str]) -> str:
+    if isinstance(s3_paths, list):
+        if not s3_paths:
+            raise ValueError("No files to analyze")
+        paths = ", ".join(f"'{path}'" for path in s3_paths)
+        return f"read_parquet([{paths}], hive_partitioning = true)"
+    return f"read_parquet('{s3_paths}', hive_partitioning = true)"
+
+
+def _time_filter(start: datetime | None, end: datetime | None) -> str | None:
+    """SQL predicate selecting rows in [start, end)."""
+    bounds = []
+    if start is not None:
+        bounds.append(f"time >= TIMESTAMP '{start.isoformat(sep=' ')}'")
+    if end is not None:
+        bounds.append(f"time < TIMESTAMP '{end.isoformat(sep=' ')}'")
+    return " AND ".join(bounds) or None
+
+
+def _daily_statistics_query(
+    source: str,
+    keys: list[str],
+    approximate: bool = False,
+    where: str | None = None,
+) -> str:
+    """Daily statistics of every variable, grouped by `keys` and the day."""
+
+    def median(column: str) -> str:
+        if approximate:
+            return f"approx_quantile({column}, 0.5)"
+        return f"MEDIAN({column})"
+
+    def mode(column: str) -> str:
+        if approximate:
+            width = APPROXIMATE_MODE_BIN_WIDTH[column]
+            return f"histogram_mode(histogram(round({column} / {width}) * {width}))"
+        # Unlike MODE(), whose pick among ties is unspecified, this matches
+        # the mode finalized from daily aggregate states
+        return f"histogram_mode(histogram({column}))"
+
+    group_by = ", ".join([*keys, "date_trunc('day', time)"])
+    order_by = ", ".join([*keys, "day DESC"])
+    select_keys = "".join(f"{key}, " for key in keys)
+    # Pushed down by DuckDB to the Parquet reader, which skips row groups
+    # whose min/max statistics fall outside the predicate
+    where_clause = f" WHERE {where}" if where else ""
+    return dedent(
         f"""
-        SELECT date_trunc('day', time) AS day,
+        SELECT {select_keys}date_trunc('day', time) AS day,
             AVG(temperature_2m) AS avg_temp,
             MIN(temperature_2m) AS min_temp,
             MAX(temperature_2m) AS max_temp,
-            MEDIAN(temperature_2m) AS median_temp,
-            MODE(temperature_2m) AS mode_temp,
+            {median("temperature_2m")} AS median_temp,
+            {mode("temperature_2m")} AS mode_temp,
             STDDEV(temperature_2m) AS stddev_temp,
             VARIANCE(temperature_2m) AS variance_temp,
             COUNT(temperature_2m) AS count_temp,
@@ -20,8 +219,8 @@ def analysis_weather(s3_path: str):
             AVG(windspeed_10m) AS avg_windspeed,
             MIN(windspeed_10m) AS min_windspeed,
             MAX(windspeed_10m) AS max_windspeed,
-            MEDIAN(windspeed_10m) AS median_windspeed,
-            MODE(windspeed_10m) AS mode_windspeed,
+            {median("windspeed_10m")} AS median_windspeed,
+            {mode("windspeed_10m")} AS mode_windspeed,
             STDDEV(windspeed_10m) AS stddev_windspeed,
             VARIANCE(windspeed_10m) AS variance_windspeed,
             COUNT(windspeed_10m) AS count_windspeed,
@@ -29,18 +228,203 @@ def analysis_weather(s3_path: str):
             AVG(relative_humidity_2m) AS avg_relative_humidity,
             MIN(relative_humidity_2m) AS min_relative_humidity,
             MAX(relative_humidity_2m) AS max_relative_humidity,
-            MEDIAN(relative_humidity_2m) AS median_relative_humidity,
-            MODE(relative_humidity_2m) AS mode_relative_humidity,
+            {median("relative_humidity_2m")} AS median_relative_humidity,
+            {mode("relative_humidity_2m")} AS mode_relative_humidity,
             STDDEV(relative_humidity_2m) AS stddev_relative_humidity,
             VARIANCE(relative_humidity_2m) AS variance_relative_humidity,
             COUNT(relative_humidity_2m) AS count_relative_humidity,
             SUM(relative_humidity_2m) AS sum_relative_humidity,
-        FROM '{s3_path}'
-        GROUP BY date_trunc('day', time)
-        ORDER BY day DESC
+        FROM {source}{where_clause}
+        GROUP BY {group_by}
+        ORDER BY {order_by}
         """
     ).strip()
-    with duckdb.connect(config={"s3_region": os.environ["REGION_NAME"]}) as conn:
-        with conn.cursor() as cursor:
-            result = cursor.execute(query)
-            return result.pl()
+
+
+def analysis_weather(
+    s3_path: str | list[str] | pl.DataFrame,
+    engine: AnalysisEngine | None = None,
+    approximate: bool = False,
+    start: datetime | None = None,
+    end: datetime | None = None,
+):
+    """
+    Aggregate hourly clean rows into daily statistics.
+
+    With approximate=True, the two holistic aggregates are replaced by
+    bounded-memory estimates:
+
+    - median: DuckDB's approx_quantile (a t-digest). Groups of up to about a
+      hundred values, e.g. the 24 hours of a day, come out exact; larger
+      groups have a rank error typically under 1%.
+    - mode: center of the most populated bin of a fixed-width histogram
+      (APPROXIMATE_MODE_BIN_WIDTH). It is within half a bin of the values
+      falling in that bin, and equals the exact mode when values are already
+      quantized to the bin width; with sparse data the densest bin may not
+      hold the exact mode.
+
+    Both sketches keep a fixed-size state per group, so they pay off for
+    large groups; for daily groups of 24 hours that state is bigger than the
+    values themselves and the exact query is faster and leaner (see
+    scripts/bench_analysis.py).
+
+    Args:
+        s3_path: Clean Parquet file(s) (path, glob or list of paths), or the
+            clean rows themselves as an in-memory DataFrame.
+        engine: Engine running the query. If None, the process-wide engine
+            is used.
+        approximate: Estimate median and mode instead of computing them
+            exactly.
+        start: Only aggregate rows at or after this time.
+        end: Only aggregate rows before this time.
+    """
+    engine = engine or get_analysis_engine()
+    where = _time_filter(start, end)
+    if isinstance(s3_path, pl.DataFrame):
+        query = _daily_statistics_query("clean_rows", [], approximate, where)
+        return engine.query(query, tables={"clean_rows": s3_path})
+    query = _daily_statistics_query(_read_clean_files(s3_path), [], approximate, where)
+    return engine.query(query)
+
+
+def analysis_weather_by_region(
+    s3_path: str | list[str],
+    engine: AnalysisEngine | None = None,
+    approximate: bool = False,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> pl.DataFrame:
+    """
+    Aggregate the clean rows of several regions in a single scan.
+
+    Same statistics as analysis_weather, grouped by region and day. The
+    region is taken from the `region=<slug>` partition of each file's path.
+
+    Args:
+        s3_path: Clean Parquet files of any number of regions (glob or list
+            of paths).
+        engine: Engine running the query. If None, the process-wide engine
+            is used.
+        approximate: Estimate median and mode, see analysis_weather.
+        start: Only aggregate rows at or after this time.
+        end: Only aggregate rows before this time.
+
+    Returns:
+        One row per region and day, with a `region` slug column first.
+    """
+    engine = engine or get_analysis_engine()
+    query = _daily_statistics_query(
+        _read_clean_files(s3_path), ["region"], approximate, _time_filter(start, end)
+    )
+    return engine.query(query)
+
+
+class PruningReport(TypedDict):
+    regions: int
+    files_total: int
+    files_scanned: int
+    # Row groups of the scanned files only
+    row_groups_total: int
+    row_groups_scanned: int
+
+
+def _row_group_counts(
+    engine: AnalysisEngine,
+    paths: list[str],
+    start: datetime | None,
+    end: datetime | None,
+) -> tuple[int, int]:
+    """Row groups of the files, and those whose time statistics match."""
+    files = ", ".join(f"'{path}'" for path in paths)
+    overlaps = " AND ".join(
+        bound
+        for bound in (
+            (
+                f"stats_max_value::TIMESTAMP >= TIMESTAMP '{start.isoformat(sep=' ')}'"
+                if start is not None
+                else None
+            ),
+            (
+                f"stats_min_value::TIMESTAMP < TIMESTAMP '{end.isoformat(sep=' ')}'"
+                if end is not None
+                else None
+            ),
+        )
+        if bound is not None
+    )
+    counts = engine.query(
+        f"""
+        SELECT COUNT(*) AS total,
+            COUNT(*) FILTER (WHERE {overlaps or "true"}) AS scanned
+        FROM parquet_metadata([{files}])
+        WHERE path_in_schema = 'time'
+        """
+    )
+    return counts["total"].item(), counts["scanned"].item()
+
+
+def analysis_weather_window(
+    clean_s3_base_path: str,
+    regions: list[str] | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    engine: AnalysisEngine | None = None,
+    approximate: bool = False,
+) -> tuple[pl.DataFrame, PruningReport]:
+    """
+    Daily statistics of a set of regions over a time window.
+
+    The predicates are applied at every level before any data is read:
+    only the requested regions' tables are listed, only the files whose
+    manifest time range overlaps [start, end) are scanned, and within them
+    DuckDB skips the row groups whose min/max statistics fall outside it.
+
+    Args:
+        clean_s3_base_path: Root of the clean layer.
+        regions: Region names; None selects every configured region.
+        start: First hour of the window (inclusive); None is unbounded.
+        end: End of the window (exclusive); None is unbounded.
+        engine: Engine running the query. If None, the process-wide engine
+            is used.
+        approximate: Estimate median and mode, see analysis_weather.
+
+    Returns:
+        The analysis_weather_by_region rows, and how much was pruned.
+    """
+    engine = engine or get_analysis_engine()
+    regions = regions if regions is not None else [r["name"] for r in REGIONS]
+    tables = [clean_layer.table_path(clean_s3_base_path, name) for name in regions]
+    with ThreadPoolExecutor() as executor:
+        files = [
+            file
+            for files in executor.map(clean_layer.list_files, tables)
+            for file in files
+        ]
+    paths = [
+        file["path"]
+        for file in files
+        if (end is None or datetime.fromisoformat(file["min_time"]) < end)
+        and (start is None or datetime.fromisoformat(file["max_time"]) >= start)
+    ]
+
+    report: PruningReport = {
+        "regions": len(regions),
+        "files_total": len(files),
+        "files_scanned": len(paths),
+        "row_groups_total": 0,
+        "row_groups_scanned": 0,
+    }
+    if not paths:
+        logger.info(f"No clean files overlap the window: {report}")
+        return pl.DataFrame(), report
+
+    report["row_groups_total"], report["row_groups_scanned"] = _row_group_counts(
+        engine, paths, start, end
+    )
+    df = analysis_weather_by_region(paths, engine, approximate, start, end)
+    logger.info(
+        f"Scanned {report['files_scanned']}/{report['files_total']} file(s) and "
+        f"{report['row_groups_scanned']}/{report['row_groups_total']} row group(s) "
+        f"of {report['regions']} region(s)"
+    )
+    return df, report
@@ -0,0 +1,229 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from contextlib import closing
+from functools import cache
+from pathlib import Path
+from typing import TypedDict
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GOVERNOR_PATH = (
+    Path.home() / ".cache" / "weather-pipeline" / "rate_governor.sqlite"
+)
+# Open-Meteo's free tier allows 600 calls per minute
+DEFAULT_REQUESTS_PER_MINUTE = 600.0
+DEFAULT_BUCKET = "open-meteo"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    blocked_until REAL NOT NULL DEFAULT 0,
+    requests INTEGER NOT NULL DEFAULT 0,
+    waited_seconds REAL NOT NULL DEFAULT 0,
+    max_wait_seconds REAL NOT NULL DEFAULT 0,
+    throttled INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+class GovernorMetrics(TypedDict):
+    name: str
+    requests: int
+    waited_seconds: float
+    max_wait_seconds: float
+    throttled: int
+
+
+class RateGovernor:
+    """
+    Token bucket shared by every thread and process using the same file.
+
+    The bucket lives in a SQLite database and each reservation is a single
+    IMMEDIATE transaction, so callers on one machine draw from the same
+    budget. Reservations may take the balance below zero: the caller is then
+    told how long to wait for its turn, which keeps waiters first come,
+    first served without polling. Counters of the time spent waiting are
+    kept alongside the bucket, over all processes.
+
+    Args:
+        name: Bucket name; governors with the same name and path share it.
+        requests_per_minute: Rate at which tokens are refilled.
+        burst: Bucket capacity (default: one second's worth of requests,
+            at least one).
+        path: SQLite database holding the buckets.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float,
+        burst: float | None = None,
+        path: str | Path = DEFAULT_GOVERNOR_PATH,
+    ):
+        self.name = name
+        self.rate = requests_per_minute / 60
+        self.burst = burst or max(1.0, self.rate)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(_SCHEMA)
+            connection.execute(
+                "INSERT OR IGNORE INTO buckets (name, tokens, updated_at) "
+                "VALUES (?, ?, ?)",
+                (name, self.burst, time.time()),
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode, so transactions are opened explicitly
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _transaction(self, statement: str, **parameters: float) -> float:
+        """Refill the bucket, then apply an update; returns the computed wait."""
+        with closing(self._connect()) as connection:
+            # Outside the try: a BEGIN that timed out has nothing to roll back
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                tokens, updated_at, blocked_until = connection.execute(
+                    "SELECT tokens, updated_at, blocked_until FROM buckets "
+                    "WHERE name = ?",
+                    (self.name,),
+                ).fetchone()
+                now = time.time()
+                # Nothing accrues before updated_at, which throttle moves to
+                # the end of the hold
+                tokens = min(
+                    self.burst, tokens + max(0.0, now - updated_at) * self.rate
+                )
+                wait = connection.execute(
+                    statement,
+                    {
+                        "name": self.name,
+                        "now": now,
+                        "tokens": tokens,
+                        "blocked_until": blocked_until,
+                        "rate": self.rate,
+                        **parameters,
+                    },
+                ).fetchone()[0]
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        return wait
+
+    def reserve(self, cost: float = 1.0) -> float:
+        """
+        Take cost tokens, without waiting.
+
+        The wait is the remaining throttle time, if any, plus the time to
+        refill the tokens this reservation takes beyond the balance.
+
+        Returns:
+            Seconds the caller must wait before sending its request.
+        """
+        wait = """
+            max(0, :blocked_until - :now) + max(0, (:cost - :tokens) / :rate)
+        """
+        return self._transaction(
+            f"""
+            UPDATE buckets SET
+                tokens = :tokens - :cost,
+                updated_at = max(updated_at, :now),
+                requests = requests + 1,
+                waited_seconds = waited_seconds + {wait},
+                max_wait_seconds = max(max_wait_seconds, {wait})
+            WHERE name = :name
+            RETURNING {wait}
+            """,
+            cost=cost,
+        )
+
+    def acquire(self, cost: float = 1.0) -> float:
+        """Wait for cost tokens; returns the time waited, in seconds."""
+        wait = self.reserve(cost)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, cost: float = 1.0) -> float:
+        """Wait for cost tokens without blocking the event loop."""
+        wait = await asyncio.to_thread(self.reserve, cost)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def throttle(self, seconds: float) -> None:
+        """
+        Hold every caller for the given time, e.g. from a Retry-After header.
+
+        The bucket is also emptied and only starts refilling once the hold
+        ends, so requests resume at the steady rate rather than in a burst.
+        """
+        self._transaction(
+            """
+            UPDATE buckets SET
+                tokens = min(:tokens, 0),
+                updated_at = max(:blocked_until, :now + :seconds),
+                blocked_until = max(:blocked_until, :now + :seconds),
+                throttled = throttled + 1
+            WHERE name = :name
+            RETURNING 0
+            """,
+            seconds=seconds,
+        )
+        logger.warning(f"Rate limit {self.name!r} throttled for {seconds:.1f}s")
+
+    def metrics(self) -> GovernorMetrics:
+        """Counters of the bucket, over every process sharing it."""
+        with closing(self._connect()) as connection:
+            requests, waited, max_wait, throttled = connection.execute(
+                "SELECT requests, waited_seconds, max_wait_seconds, throttled "
+                "FROM buckets WHERE name = ?",
+                (self.name,),
+            ).fetchone()
+        return {
+            "name": self.name,
+            "requests": requests,
+            "waited_seconds": waited,
+            "max_wait_seconds": max_wait,
+            "throttled": throttled,
+        }
+
+
+@cache
+def get_governor(
+    name: str, requests_per_minute: float, burst: float | None = None
+) -> RateGovernor:
+    """Process-wide governor of a bucket, in the default database."""
+    return RateGovernor(
+        name,
+        requests_per_minute,
+        burst,
+        os.getenv("RATE_GOVERNOR_PATH", str(DEFAULT_GOVERNOR_PATH)),
+    )
+
+
+@cache
+def get_default_governor() -> RateGovernor | None:
+    """
+    Governor of the weather API requests, configured from the environment.
+
+    HTTP_RATE_LIMIT (requests per minute, 0 disables the governor),
+    HTTP_RATE_BURST and RATE_GOVERNOR_PATH override the defaults.
+    """
+    requests_per_minute = float(
+        os.getenv("HTTP_RATE_LIMIT", str(DEFAULT_REQUESTS_PER_MINUTE))
+    )
+    if requests_per_minute <= 0:
+        return None
+    burst = os.getenv("HTTP_RATE_BURST")
+    return get_governor(
+        DEFAULT_BUCKET, requests_per_minute, float(burst) if burst else None
+    )
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import date
+from functools import cache
+from pathlib import Path
+from uuid import uuid4
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "weather-pipeline" / "responses"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def cache_key(
+    latitude: float,
+    longitude: float,
+    day: date,
+    variables: list[str],
+    timezone: str,
+) -> str:
+    """Content address of one location-day of an API response."""
+    identity = json.dumps(
+        [
+            round(float(latitude), 4),
+            round(float(longitude), 4),
+            day.isoformat(),
+            sorted(variables),
+            timezone,
+        ]
+    )
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+
+def _size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+class ResponseCache:
+    """
+    Size-bounded, least-recently-used cache of JSON documents on local disk.
+
+    Every entry lives in its own file, written atomically, so the cache can be
+    shared by concurrent threads and processes. Recency is tracked through
+    the file modification time, which is refreshed on every hit.
+
+    The total size is scanned once, then kept as a running count of the
+    bytes written by this process; the directory is only scanned again when
+    a write takes that count over max_bytes. Other processes' writes are
+    picked up by that scan, so the bound may be overshot by what they wrote
+    in the meantime.
+
+    Args:
+        directory: Directory holding the cache entries.
+        max_bytes: Total size above which the least recently used entries
+            are evicted.
+    """
+
+    def __init__(self, directory: str | Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._total_bytes: int | None = None
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> dict | None:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        expires_at = entry["expires_at"]
+        if expires_at is not None and expires_at < time.time():
+            path.unlink(missing_ok=True)
+            return None
+
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return entry["value"]
+
+    def put_many(self, entries: dict[str, dict], ttl: dict[str, float | None]) -> None:
+        """
+        Store several entries and evict once afterwards.
+
+        Args:
+            entries: Values to store, keyed by cache key.
+            ttl: Time to live in seconds for each key; None never expires.
+        """
+        now = time.time()
+        written = 0
+        for key, value in entries.items():
+            key_ttl = ttl[key]
+            entry = {
+                "expires_at": None if key_ttl is None else now + key_ttl,
+                "value": value,
+            }
+            path = self._path(key)
+            path.parent.mkdir(exist_ok=True)
+            tmp_path = path.with_suffix(f".{uuid4().hex}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            written += tmp_path.stat().st_size - _size(path)
+            os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._total_bytes is None:
+                # First write: the scan already counts it
+                self._total_bytes = sum(size for _, size, _ in self._scan())
+            else:
+                self._total_bytes += written
+            over_limit = self._total_bytes > self.max_bytes
+        if over_limit:
+            self.evict()
+
+    def put(self, key: str, value: dict, ttl: float | None = None) -> None:
+        self.put_many({key: value}, {key: ttl})
+
+    def _scan(self) -> list[tuple[float, int, Path]]:
+        files = []
+        for path in self.directory.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def evict(self) -> None:
+        """Delete the least recently used entries until under max_bytes."""
+        with self._lock:
+            files = self._scan()
+            total = sum(size for _, size, _ in files)
+            if total > self.max_bytes:
+                files.sort()
+                for _, size, path in files:
+                    if total <= self.max_bytes:
+                        break
+                    path.unlink(missing_ok=True)
+                    total -= size
+                logger.info(f"Response cache evicted down to {total} bytes")
+            self._total_bytes = total
+
+
+@cache
+def get_default_cache() -> ResponseCache | None:
+    """
+    Process-wide cache configured from the environment.
+
+    WEATHER_CACHE_DIR and WEATHER_CACHE_MAX_BYTES override the location and
+    size bound; WEATHER_CACHE_ENABLED=0 disables caching.
+    """
+    if os.getenv("WEATHER_CACHE_ENABLED", "1") == "0":
+        return None
+    return ResponseCache(
+        os.getenv("WEATHER_CACHE_DIR", str(DEFAULT_CACHE_DIR)),
+        int(os.getenv("WEATHER_CACHE_MAX_BYTES", str(DEFAULT_MAX_BYTES))),
+    )
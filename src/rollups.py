@@ -0,0 +1,179 @@
+import logging
+from datetime import datetime, timedelta
+from typing import TypedDict
+
+import polars as pl
+
+from src import clean_layer, daily_aggregates
+
+
+logger = logging.getLogger(__name__)
+
+# Level -> (level it is built from, period). Weeks do not nest in months, so
+# both are built from days; years are built from months.
+ROLLUP_LEVELS = {
+    "weekly": ("daily", "1w"),
+    "monthly": ("daily", "1mo"),
+    "yearly": ("monthly", "1y"),
+}
+# Every level, coarsest first, with its period
+LEVEL_PERIODS = {"yearly": "1y", "monthly": "1mo", "weekly": "1w", "daily": "1d"}
+
+
+class RollupReport(TypedDict):
+    region: str
+    level: str
+    periods: int
+
+
+def level_table(aggregate_s3_base_path: str, level: str, region: str) -> str:
+    """Location of a region's table at one level of the rollup pyramid."""
+    return clean_layer.table_path(f"{aggregate_s3_base_path}/{level}", region)
+
+
+def _truncate(value: datetime, every: str) -> datetime:
+    return pl.Series([value]).dt.truncate(every).item()
+
+
+def _next_period(value: datetime, every: str) -> datetime:
+    return pl.Series([value]).dt.truncate(every).dt.offset_by(every).item()
+
+
+def rollup(
+    aggregate_s3_base_path: str,
+    region: str,
+    first_day: datetime | None,
+    last_day: datetime | None,
+) -> list[RollupReport]:
+    """
+    Rebuild the weekly, monthly and yearly periods covering the given days.
+
+    Each level is recomputed from the level below it, only for the periods
+    that contain [first_day, last_day], so a daily run touches one week, one
+    month and one year. A level that has no data yet is built from the whole
+    level below.
+
+    Args:
+        aggregate_s3_base_path: Root of the aggregate tables; the daily level
+            is expected under `<root>/daily`.
+        region: Region whose tables are rolled up.
+        first_day: First day whose daily state changed.
+        last_day: Last day whose daily state changed. If both are None, only
+            the levels that have no data yet are built.
+    """
+    reports = []
+    for level, (source, every) in ROLLUP_LEVELS.items():
+        table = level_table(aggregate_s3_base_path, level, region)
+        source_table = level_table(aggregate_s3_base_path, source, region)
+        if clean_layer.list_files(table):
+            if first_day is None or last_day is None:
+                continue
+            start = _truncate(first_day, every)
+            end = _next_period(last_day, every) - timedelta(microseconds=1)
+            states = daily_aggregates.read_states(source_table, start, end)
+        else:
+            logger.info(f"Building {table} from the whole of {source_table}")
+            states = daily_aggregates.read_states(source_table)
+        if states.is_empty():
+            continue
+
+        periods = daily_aggregates.merge_states(states, every)
+        manifest = clean_layer.upsert(table, periods, name_prefix=level)
+        logger.info(
+            f"Rolled up {periods.height} {level} period(s) of {region} "
+            f"(version {manifest['version']})"
+        )
+        reports.append({"region": region, "level": level, "periods": periods.height})
+    return reports
+
+
+def split_range(
+    start: datetime, end: datetime, levels: tuple[str, ...] = ("yearly", "monthly")
+) -> list[tuple[str, datetime, datetime]]:
+    """
+    Tile [start, end) with whole periods, coarsest first.
+
+    The whole years of the range are taken from the yearly level, the whole
+    months left on either side from the monthly level and the remaining
+    days from the daily level. Start and end are expected to be midnights.
+
+    Returns:
+        (level, piece start, piece end) of every piece, in time order.
+    """
+    if start >= end:
+        return []
+    if not levels:
+        return [("daily", start, end)]
+    level, *finer = levels
+    every = LEVEL_PERIODS[level]
+    first = start if _truncate(start, every) == start else _next_period(start, every)
+    last = _truncate(end, every)
+    if first >= last:
+        return split_range(start, end, tuple(finer))
+    return [
+        *split_range(start, first, tuple(finer)),
+        (level, first, last),
+        *split_range(last, end, tuple(finer)),
+    ]
+
+
+def read_rollup(
+    aggregate_s3_base_path: str,
+    region: str,
+    level: str,
+    start: datetime,
+    end: datetime,
+) -> pl.DataFrame:
+    """
+    Statistics of every period of a level starting within [start, end).
+
+    Returns:
+        The analysis_weather columns, one row per period, most recent first.
+    """
+    table = level_table(aggregate_s3_base_path, level, region)
+    states = daily_aggregates.read_states(table, start, end - timedelta(microseconds=1))
+    if states.is_empty():
+        return states
+    return daily_aggregates.finalize(states)
+
+
+def query_range(
+    aggregate_s3_base_path: str,
+    region: str,
+    start: datetime,
+    end: datetime,
+) -> pl.DataFrame:
+    """
+    Statistics over the whole of [start, end), from the coarsest levels.
+
+    The range is split by split_range, so e.g. 2021-03-15..2024-09-20 reads
+    2 yearly rows, 17 monthly rows and the 36 days at its edges, rather than
+    every day of the span.
+
+    Returns:
+        A single row of analysis_weather columns, dated at the first period
+        with data, or an empty frame if there is no data in the range.
+    """
+    pieces = split_range(start, end)
+    states = [
+        daily_aggregates.read_states(
+            level_table(aggregate_s3_base_path, level, region),
+            piece_start,
+            piece_end - timedelta(microseconds=1),
+        )
+        for level, piece_start, piece_end in pieces
+    ]
+    states = [piece for piece in states if not piece.is_empty()]
+    logger.info(
+        f"Answering {start:%Y-%m-%d}..{end:%Y-%m-%d} from "
+        + ", ".join(
+            f"{level} {piece_start:%Y-%m-%d}..{piece_end:%Y-%m-%d}"
+            for level, piece_start, piece_end in pieces
+        )
+    )
+    if not states:
+        return pl.DataFrame()
+    merged = daily_aggregates.merge_states(
+        pl.concat(states, how="diagonal_relaxed"), None
+    )
+    return daily_aggregates.finalize(merged)
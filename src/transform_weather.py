@@ -1,5 +1,27 @@
 ## transform_weather.py
 import polars as pl
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.json as pajson
+
+from src.fetch_weather import HOURLY_VARIABLES
+
+
+OPEN_METEO_TIME_FORMAT = "%Y-%m-%dT%H:%M"
+
+# Only the hourly block is decoded; numbers are parsed straight to float64
+_PAYLOAD_SCHEMA = pa.schema(
+    [
+        pa.field(
+            "hourly",
+            pa.struct(
+                [pa.field("time", pa.list_(pa.string()))]
+                + [pa.field(name, pa.list_(pa.float64())) for name in HOURLY_VARIABLES]
+            ),
+        )
+    ]
+)
+_MIN_BLOCK_SIZE = 1 << 20
 
 
 def transform_weather(df: pl.DataFrame):
@@ -12,3 +34,36 @@ def transform_weather(df: pl.DataFrame):
         ]
     )
     return df
+
+
+def decode_weather_payload(raw: bytes) -> pl.DataFrame:
+    """
+    Decode a raw Open-Meteo JSON payload directly into typed columns.
+
+    Equivalent to `transform_weather(pl.from_dict(json.loads(raw)["hourly"]))`,
+    but the document is parsed by Arrow's JSON reader against a fixed schema
+    and the timestamps with an explicit format, so no Python objects are
+    created per value.
+    """
+    table = pajson.read_json(
+        pa.BufferReader(raw),
+        read_options=pajson.ReadOptions(
+            # The whole document is a single JSON record and must fit a block
+            block_size=max(len(raw) + 1, _MIN_BLOCK_SIZE),
+        ),
+        parse_options=pajson.ParseOptions(
+            explicit_schema=_PAYLOAD_SCHEMA,
+            unexpected_field_behavior="ignore",
+            newlines_in_values=True,
+        ),
+    )
+    hourly = table.column("hourly").combine_chunks()
+    columns = pa.table(
+        {
+            field.name: pc.list_flatten(hourly.field(field.name))
+            for field in _PAYLOAD_SCHEMA.field("hourly").type
+        }
+    )
+    return pl.from_arrow(columns).with_columns(
+        pl.col("time").str.strptime(pl.Datetime("us"), OPEN_METEO_TIME_FORMAT)
+    )
@@ -1,2 +1,16 @@
+import re
+import unicodedata
+
+
 def create_s3_path(bucket_name: str, *paths: str) -> str:
     return f"s3://{bucket_name}/{'/'.join(paths)}"
+
+
+def region_slug(region_name: str) -> str:
+    """ASCII, path-safe form of a region name, e.g. 'São Paulo' -> 'sao_paulo'."""
+    ascii_name = (
+        unicodedata.normalize("NFKD", region_name)
+        .encode("ascii", "ignore")
+        .decode("ascii")
+    )
+    return re.sub(r"[^a-z0-9]+", "_", ascii_name.lower()).strip("_")
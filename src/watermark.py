@@ -0,0 +1,66 @@
+import json
+from datetime import datetime
+
+from botocore.exceptions import ClientError
+
+from src.file_handling import is_write_conflict, read_object, write_object
+
+
+MAX_WRITE_ATTEMPTS = 5
+
+
+def watermark_path(state_s3_base_path: str, region_name: str) -> str:
+    return f"{state_s3_base_path}/watermarks/{region_name}.json"
+
+
+def read_watermark(s3_path: str) -> datetime | None:
+    """
+    Read the last hour collected for a region.
+
+    Returns:
+        The high-water mark, or None if the region was never collected.
+    """
+    obj = read_object(s3_path)
+    if obj is None:
+        return None
+    body, _ = obj
+    return _parse(body)
+
+
+def _parse(body: bytes) -> datetime:
+    return datetime.fromisoformat(json.loads(body)["watermark"])
+
+
+def write_watermark(s3_path: str, watermark: datetime) -> bool:
+    """
+    Advance a region's high-water mark, never moving it backwards.
+
+    The mark is replaced with a conditional PUT against the ETag it was read
+    with, so of two overlapping runs the one finishing last cannot undo the
+    other's progress; on a conflict the mark is read again and compared anew.
+
+    Returns:
+        Whether the mark was moved, False if it was already at or past
+        watermark.
+    """
+    state = {
+        "watermark": watermark.isoformat(),
+        "updated_at": datetime.now().isoformat(),
+    }
+    for _ in range(MAX_WRITE_ATTEMPTS):
+        obj = read_object(s3_path)
+        etag = ""
+        if obj is not None:
+            body, etag = obj
+            if _parse(body) >= watermark:
+                return False
+        try:
+            write_object(json.dumps(state).encode("utf-8"), s3_path, if_match=etag)
+        except ClientError as e:
+            if is_write_conflict(e):
+                continue
+            raise
+        return True
+    raise RuntimeError(
+        f"Could not advance {s3_path} after {MAX_WRITE_ATTEMPTS} attempts"
+    )
@@ -0,0 +1,66 @@
+import os
+from datetime import datetime
+from uuid import uuid4
+
+import boto3
+import numpy as np
+import polars as pl
+import pytest
+from moto.server import ThreadedMotoServer
+
+from src import file_handling
+
+
+BUCKET_NAME = "weather-test"
+
+
+@pytest.fixture(scope="session")
+def s3_server():
+    """A local S3 (moto) server, which boto3 and DuckDB are pointed at."""
+    server = ThreadedMotoServer(port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    environment = {
+        "AWS_ENDPOINT_URL": f"http://{host}:{port}",
+        "AWS_ACCESS_KEY_ID": "test",
+        "AWS_SECRET_ACCESS_KEY": "test",
+        "AWS_DEFAULT_REGION": "us-east-1",
+        "REGION_NAME": "us-east-1",
+    }
+    previous = {name: os.environ.get(name) for name in environment}
+    os.environ.update(environment)
+    file_handling._s3_client = None
+    boto3.client("s3").create_bucket(Bucket=BUCKET_NAME)
+    yield
+    for name, value in previous.items():
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+    file_handling._s3_client = None
+    server.stop()
+
+
+@pytest.fixture
+def s3_base_path(s3_server) -> str:
+    """A prefix of the test bucket of its own for every test."""
+    return f"s3://{BUCKET_NAME}/{uuid4().hex}"
+
+
+@pytest.fixture
+def hourly_rows():
+    """Builds clean rows of every hour in [start, end), on a 0.1 grid."""
+
+    def build(start: datetime, end: datetime, seed: int = 0) -> pl.DataFrame:
+        times = pl.datetime_range(start, end, "1h", closed="left", eager=True)
+        rng = np.random.default_rng(seed)
+        return pl.DataFrame(
+            {
+                "time": times,
+                "temperature_2m": rng.normal(20, 5, len(times)).round(1),
+                "windspeed_10m": rng.gamma(2, 3, len(times)).round(1),
+                "relative_humidity_2m": rng.integers(20, 100, len(times)).astype(float),
+            }
+        )
+
+    return build
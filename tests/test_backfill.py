@@ -0,0 +1,97 @@
+from datetime import date, datetime, timedelta
+
+import polars as pl
+import pytest
+
+from src import backfill, clean_layer
+
+REGIONS = [
+    {"name": "North", "latitude": -10.0, "longitude": -50.0},
+    {"name": "South", "latitude": -30.0, "longitude": -50.0},
+]
+
+
+class FakeApi:
+    """Serves synthetic history and records every request."""
+
+    def __init__(self, hourly_rows):
+        self.hourly_rows = hourly_rows
+        self.requests = []
+        self.failing: set[date] = set()
+
+    def fetch(self, regions, start, end, cache):
+        self.requests.append({"start": start, "cache": cache})
+        if start in self.failing:
+            raise RuntimeError("API unavailable")
+        rows = self.hourly_rows(
+            datetime.combine(start, datetime.min.time()),
+            datetime.combine(end + timedelta(days=1), datetime.min.time()),
+        ).with_columns(pl.col("time").dt.strftime("%Y-%m-%dT%H:%M"))
+        hourly = rows.to_dict(as_series=False)
+        return {region["name"]: {"hourly": hourly} for region in regions}
+
+
+class RecordingGovernor:
+    def __init__(self):
+        self.costs = []
+
+    def acquire(self, cost=1.0):
+        self.costs.append(cost)
+        return 0.0
+
+
+@pytest.fixture
+def api(hourly_rows, monkeypatch):
+    api = FakeApi(hourly_rows)
+    monkeypatch.setattr(backfill, "fetch_weather_history_batch", api.fetch)
+    return api
+
+
+@pytest.fixture
+def governor(monkeypatch):
+    governor = RecordingGovernor()
+    monkeypatch.setattr(backfill, "get_governor", lambda name, rpm: governor)
+    return governor
+
+
+def _run(s3_base_path):
+    return backfill.backfill(
+        REGIONS,
+        date(2024, 1, 15),
+        date(2024, 3, 10),
+        f"{s3_base_path}/clean",
+        f"{s3_base_path}/state",
+    )
+
+
+def test_reruns_only_fetch_what_is_missing(s3_base_path, api, governor):
+    api.failing.add(date(2024, 2, 1))
+    report = _run(s3_base_path)
+    assert report == {
+        "windows": 3,
+        "skipped": 0,
+        "completed": 2,
+        "failed": 1,
+        "rows": 2 * 24 * (17 + 10),
+    }
+
+    api.requests.clear()
+    api.failing.clear()
+    report = _run(s3_base_path)
+    assert [request["start"] for request in api.requests] == [date(2024, 2, 1)]
+    assert (report["windows"], report["skipped"], report["completed"]) == (1, 4, 1)
+
+    api.requests.clear()
+    assert _run(s3_base_path)["windows"] == 0
+    assert api.requests == []
+    for region in REGIONS:
+        table = clean_layer.table_path(f"{s3_base_path}/clean", region["name"])
+        rows = clean_layer.read_rows(table, datetime(2024, 1, 1), datetime(2024, 4, 1))
+        assert rows.height == 24 * (17 + 29 + 10)
+
+
+def test_windows_bypass_the_response_cache(s3_base_path, api, governor):
+    _run(s3_base_path)
+    assert [request["cache"] for request in api.requests] == [None] * 3
+    # The API bills one call per region of a request
+    assert governor.costs == [len(REGIONS)] * 3
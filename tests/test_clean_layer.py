@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+
+import polars as pl
+import pytest
+
+from src import clean_layer
+from src.file_handling import list_bucket_objects, object_exists, upload_dataframe
+
+
+REGION = "Test Region"
+
+
+def rows(start_hour: int, end_hour: int, value: float) -> pl.DataFrame:
+    times = [
+        datetime(2024, 1, 1) + timedelta(hours=h) for h in range(start_hour, end_hour)
+    ]
+    return pl.DataFrame(
+        {
+            "time": times,
+            "temperature_2m": [value] * len(times),
+            "windspeed_10m": [1.0] * len(times),
+            "relative_humidity_2m": [50.0] * len(times),
+        }
+    )
+
+
+def all_rows(table: str) -> pl.DataFrame:
+    return clean_layer.read_rows(table, datetime.min, datetime.max)
+
+
+def parquet_objects(table: str) -> set[str]:
+    bucket, _, prefix = table.removeprefix("s3://").partition("/")
+    return {
+        path
+        for path in list_bucket_objects(bucket, f"{prefix}/")
+        if path.endswith(".parquet")
+    }
+
+
+def test_upsert_replaces_rows_with_the_same_timestamp(s3_base_path):
+    table = clean_layer.table_path(s3_base_path, REGION)
+    clean_layer.upsert(table, rows(0, 6, 1.0))
+    manifest = clean_layer.upsert(table, rows(3, 9, 2.0))
+
+    assert manifest["version"] == 2
+    merged = all_rows(table)
+    assert merged["time"].to_list() == rows(0, 9, 0.0)["time"].to_list()
+    assert merged["temperature_2m"].to_list() == [1.0] * 3 + [2.0] * 6
+    # The replaced file is expired, not deleted, until a vacuum
+    assert len(manifest["files"]) == 1
+    assert len(manifest["expired"]) == 1
+
+
+def test_compaction_merges_small_files(s3_base_path):
+    table = clean_layer.table_path(s3_base_path, REGION)
+    for hour in range(0, 12, 3):
+        clean_layer.append(table, rows(hour, hour + 4, float(hour)))
+
+    report = clean_layer.compact(table)
+
+    assert report["files_removed"] == 4
+    assert report["files_added"] == 1
+    assert report["rows_before"] == 16
+    assert report["rows_after"] == 13
+    compacted = all_rows(table)
+    assert compacted.height == 13
+    # The most recently committed row wins
+    assert (
+        compacted.filter(pl.col("time") == datetime(2024, 1, 1, 3))[
+            "temperature_2m"
+        ].item()
+        == 3.0
+    )
+
+
+def test_conflicting_compaction_leaves_no_orphan_files(s3_base_path, monkeypatch):
+    table = clean_layer.table_path(s3_base_path, REGION)
+    clean_layer.append(table, rows(0, 4, 1.0))
+    clean_layer.append(table, rows(4, 8, 1.0))
+
+    commit = clean_layer.commit
+
+    def commit_after_an_upsert(*args, **kwargs):
+        monkeypatch.setattr(clean_layer, "commit", commit)
+        clean_layer.upsert(table, rows(2, 3, 2.0))
+        return commit(*args, **kwargs)
+
+    monkeypatch.setattr(clean_layer, "commit", commit_after_an_upsert)
+    with pytest.raises(clean_layer.CommitConflictError):
+        clean_layer.compact(table)
+
+    manifest, _ = clean_layer.read_manifest(table)
+    referenced = {file["path"] for file in manifest["files"]} | {
+        file["path"] for file in manifest["expired"]
+    }
+    assert parquet_objects(table) == referenced
+    assert all_rows(table)["temperature_2m"].to_list() == [1.0] * 2 + [2.0] + [1.0] * 5
+
+
+def test_unmanaged_files_are_adopted_once(s3_base_path, monkeypatch):
+    table = clean_layer.table_path(s3_base_path, REGION)
+    upload_dataframe(rows(0, 4, 1.0), f"{table}/year=2024/month=01/legacy.parquet")
+
+    assert [file["rows"] for file in clean_layer.list_files(table)] == [4]
+    assert object_exists(f"{table}/{clean_layer.MANIFEST_FILENAME}")
+
+    def no_download(path):
+        raise AssertionError(f"{path} downloaded again")
+
+    monkeypatch.setattr(clean_layer, "download_dataframe", no_download)
+    assert [file["rows"] for file in clean_layer.list_files(table)] == [4]
@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from polars.testing import assert_frame_equal
+
+from src import daily_aggregates
+from src.query_weather import analysis_weather
+
+
+def test_finalize_matches_the_clean_scan(hourly_rows):
+    rows = hourly_rows(datetime(2024, 1, 1), datetime(2024, 3, 1))
+    expected = analysis_weather(rows)
+    actual = daily_aggregates.finalize(daily_aggregates.daily_state(rows))
+    assert_frame_equal(
+        actual, expected.select(actual.columns), check_dtypes=False, rel_tol=1e-9
+    )
+
+
+def test_merged_states_match_the_clean_scan_of_the_period(hourly_rows):
+    rows = hourly_rows(datetime(2024, 1, 1), datetime(2024, 4, 1))
+    expected = analysis_weather(
+        rows.with_columns(rows["time"].dt.truncate("1mo").alias("time"))
+    )
+    actual = daily_aggregates.finalize(
+        daily_aggregates.merge_states(daily_aggregates.daily_state(rows), "1mo")
+    )
+    assert actual.height == 3
+    assert_frame_equal(
+        actual, expected.select(actual.columns), check_dtypes=False, rel_tol=1e-9
+    )
@@ -0,0 +1,48 @@
+import polars as pl
+import pytest
+
+from src.file_handling import (
+    ExportFormats,
+    S3MultipartWriter,
+    download_dataframe,
+    get_s3_client,
+    object_exists,
+    read_object,
+    upload_dataframe,
+)
+
+
+@pytest.mark.parametrize("format", list(ExportFormats))
+@pytest.mark.parametrize("lazy", [False, True])
+def test_dataframes_round_trip(s3_base_path, format, lazy):
+    df = pl.DataFrame({"x": list(range(1000)), "y": [i / 3 for i in range(1000)]})
+    path = f"{s3_base_path}/frame.{format}"
+    upload_dataframe(df.lazy() if lazy else df, path)
+    assert download_dataframe(path).equals(df)
+
+
+def test_multipart_writer_publishes_on_a_clean_exit(s3_base_path):
+    path = f"{s3_base_path}/large.bin"
+    body = bytes(range(256)) * 50_000
+    with S3MultipartWriter(path, part_size=5 * 1024 * 1024) as writer:
+        writer.write(body)
+    assert read_object(path)[0] == body
+
+
+@pytest.mark.parametrize("size", [10, 6 * 1024 * 1024])
+def test_multipart_writer_does_not_publish_partial_objects(s3_base_path, size):
+    path = f"{s3_base_path}/partial.bin"
+    with pytest.raises(RuntimeError):
+        with S3MultipartWriter(path, part_size=5 * 1024 * 1024) as writer:
+            writer.write(b"x" * size)
+            raise RuntimeError("failed midway")
+    assert not object_exists(path)
+
+    writer = S3MultipartWriter(path, part_size=5 * 1024 * 1024)
+    writer.write(b"x" * size)
+    writer.close()
+    assert not object_exists(path)
+
+    bucket, _, prefix = s3_base_path.removeprefix("s3://").partition("/")
+    uploads = get_s3_client().list_multipart_uploads(Bucket=bucket, Prefix=prefix)
+    assert not uploads.get("Uploads")
@@ -0,0 +1,79 @@
+import asyncio
+
+import httpx
+import pytest
+
+from src import http_client
+from src.http_client import AsyncHttpClient, fetch_json_many, get_default_client
+
+
+@pytest.fixture(autouse=True)
+def no_waiting(monkeypatch):
+    monkeypatch.setattr(http_client, "get_default_governor", lambda: None)
+    monkeypatch.setattr(http_client, "backoff_delay", lambda attempt: 0)
+
+
+def _client(handler, **options) -> AsyncHttpClient:
+    return AsyncHttpClient(transport=httpx.MockTransport(handler), **options)
+
+
+def test_retries_retryable_statuses_and_transport_errors():
+    attempts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        attempts.append(request.url.path)
+        if len(attempts) == 1:
+            raise httpx.ConnectError("refused", request=request)
+        if len(attempts) == 2:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"attempt": len(attempts)})
+
+    assert fetch_json_many([("http://stub/a", None)], client=_client(handler)) == [
+        {"attempt": 3}
+    ]
+    assert attempts == ["/a", "/a", "/a"]
+
+
+def test_raises_after_the_last_retry():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(429)
+
+    client = _client(handler, max_retries=2)
+    with pytest.raises(httpx.HTTPStatusError):
+        fetch_json_many([("http://stub/a", None)], client=client)
+
+
+def test_does_not_retry_client_errors():
+    attempts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        attempts.append(request.url.path)
+        return httpx.Response(404)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        fetch_json_many([("http://stub/a", None)], client=_client(handler))
+    assert len(attempts) == 1
+
+
+def test_responses_keep_request_order():
+    async def handler(request: httpx.Request) -> httpx.Response:
+        index = int(request.url.params["i"])
+        # Later requests complete first
+        await asyncio.sleep(0.01 * (5 - index))
+        return httpx.Response(200, json=index)
+
+    requests = [("http://stub/", {"i": i}) for i in range(5)]
+    assert fetch_json_many(requests, client=_client(handler)) == list(range(5))
+
+
+def test_client_is_reused_across_calls():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        return httpx.Response(200, json=len(calls))
+
+    client = _client(handler)
+    assert fetch_json_many([("http://stub/a", None)], client=client) == [1]
+    assert fetch_json_many([("http://stub/b", None)], client=client) == [2]
+    assert get_default_client() is get_default_client()
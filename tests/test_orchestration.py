@@ -0,0 +1,30 @@
+from datetime import datetime
+
+from src import clean_layer
+from src.file_handling import download_dataframe
+from src.orchestration import (
+    orchestrate_weather_analysis,
+    orchestrate_weather_analysis_batch,
+)
+
+
+def test_analysis_modes_share_the_region_layout(s3_base_path, hourly_rows):
+    clean = f"{s3_base_path}/clean"
+    analysis = f"{s3_base_path}/analysis"
+    results = []
+    for region in ["North Region", "South Region"]:
+        table = clean_layer.table_path(clean, region)
+        clean_layer.upsert(
+            table, hourly_rows(datetime(2024, 1, 1), datetime(2024, 1, 3))
+        )
+        results.append({"region": region, "date": "20240103_0000", "s3_path": table})
+
+    single = [orchestrate_weather_analysis(result, analysis) for result in results]
+    batch = orchestrate_weather_analysis_batch(results, analysis)
+
+    assert [result["s3_path"] for result in single] == [
+        f"{analysis}/region=north_region/weather_history_North Region_20240103_0000.parquet",
+        f"{analysis}/region=south_region/weather_history_South Region_20240103_0000.parquet",
+    ]
+    assert batch == single
+    assert download_dataframe(single[0]["s3_path"]).height == 2
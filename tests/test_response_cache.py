@@ -0,0 +1,63 @@
+import os
+from datetime import date
+
+from src import fetch_weather
+from src.response_cache import ResponseCache
+
+
+def _touch(directory, key, mtime):
+    os.utime(next(directory.rglob(f"{key}.json")), (mtime, mtime))
+
+
+def _disk_usage(directory):
+    return sum(path.stat().st_size for path in directory.rglob("*.json"))
+
+
+def test_evicts_least_recently_used_once_over_the_limit(tmp_path):
+    cache = ResponseCache(tmp_path, max_bytes=200)
+    for i in range(3):
+        cache.put(f"{i:02d}key", {"i": i})
+        _touch(tmp_path, f"{i:02d}key", 1_000 + i)
+    # A hit makes the entry the most recently used
+    assert cache.get("00key") == {"i": 0}
+
+    cache.put("03key", {"i": 3, "padding": "x" * 100})
+    assert cache.get("01key") is None
+    assert cache.get("00key") == {"i": 0}
+    assert cache.get("03key") is not None
+    assert _disk_usage(tmp_path) <= 200
+
+
+def test_other_writers_are_evicted_by_the_next_scan(tmp_path):
+    cache = ResponseCache(tmp_path, max_bytes=200)
+    other = ResponseCache(tmp_path, max_bytes=200)
+    cache.put("00key", {"i": 0})
+    other.put("01key", {"i": 1, "padding": "x" * 100})
+    _touch(tmp_path, "01key", 1_000)
+
+    # Under this process's running count, the overshoot goes unnoticed
+    cache.put("02key", {"i": 2})
+    assert cache.get("01key") is not None
+    assert _disk_usage(tmp_path) > 200
+
+    cache.put("03key", {"i": 3, "padding": "x" * 100})
+    assert cache.get("01key") is None
+    assert _disk_usage(tmp_path) <= 200
+
+
+def test_none_bypasses_the_default_cache(monkeypatch):
+    def fail():
+        raise AssertionError("default cache used")
+
+    used = []
+
+    def fetch(locations, start, end, timezone, chunk_size, cache):
+        used.append(cache)
+        return [{}]
+
+    monkeypatch.setattr(fetch_weather, "get_default_cache", fail)
+    monkeypatch.setattr(fetch_weather, "_fetch_history_cached", fetch)
+    fetch_weather.fetch_weather_history(
+        0, 0, date(2024, 1, 1), date(2024, 1, 1), cache=None
+    )
+    assert used == [None]
@@ -0,0 +1,54 @@
+from datetime import datetime
+
+import polars as pl
+import pytest
+
+from src import clean_layer, daily_aggregates, rollups
+from src.query_weather import analysis_weather
+
+
+REGION = "Test Region"
+
+
+def test_split_range_takes_whole_years_then_months_then_days():
+    assert rollups.split_range(datetime(2021, 3, 15), datetime(2024, 9, 20)) == [
+        ("daily", datetime(2021, 3, 15), datetime(2021, 4, 1)),
+        ("monthly", datetime(2021, 4, 1), datetime(2022, 1, 1)),
+        ("yearly", datetime(2022, 1, 1), datetime(2024, 1, 1)),
+        ("monthly", datetime(2024, 1, 1), datetime(2024, 9, 1)),
+        ("daily", datetime(2024, 9, 1), datetime(2024, 9, 20)),
+    ]
+    assert rollups.split_range(datetime(2024, 1, 3), datetime(2024, 1, 10)) == [
+        ("daily", datetime(2024, 1, 3), datetime(2024, 1, 10))
+    ]
+
+
+def test_query_range_reads_coarse_levels_for_unaligned_ranges(
+    s3_base_path, hourly_rows, monkeypatch
+):
+    rows = hourly_rows(datetime(2021, 1, 1), datetime(2025, 1, 1))
+    daily_table = rollups.level_table(s3_base_path, "daily", REGION)
+    clean_layer.upsert(daily_table, daily_aggregates.daily_state(rows), "daily")
+    rollups.rollup(s3_base_path, REGION, None, None)
+
+    rows_read = {}
+    read_states = daily_aggregates.read_states
+
+    def counting_read_states(table, *args):
+        states = read_states(table, *args)
+        level = table.removeprefix(f"{s3_base_path}/").split("/")[0]
+        rows_read[level] = rows_read.get(level, 0) + states.height
+        return states
+
+    monkeypatch.setattr(daily_aggregates, "read_states", counting_read_states)
+    start, end = datetime(2021, 3, 15), datetime(2024, 9, 20)
+    result = rollups.query_range(s3_base_path, REGION, start, end)
+
+    assert rows_read == {"daily": 36, "monthly": 17, "yearly": 2}
+    in_range = rows.filter(pl.col("time").is_between(start, end, closed="left"))
+    expected = analysis_weather(in_range.with_columns(pl.lit(start).alias("time")))
+    assert result.height == 1
+    for column in ("count_temp", "min_temp", "max_temp", "median_temp", "mode_temp"):
+        assert result[column].item() == expected[column].item()
+    assert result["avg_temp"].item() == pytest.approx(expected["avg_temp"].item())
+    assert result["stddev_temp"].item() == pytest.approx(expected["stddev_temp"].item())
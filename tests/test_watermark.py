@@ -0,0 +1,62 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from src import clean_layer
+from src.file_handling import write_object
+from src.orchestration import orchestrate_weather_transform
+from src.watermark import read_watermark, watermark_path, write_watermark
+
+
+def test_watermark_never_moves_backwards(s3_base_path):
+    path = watermark_path(s3_base_path, "Test Region")
+    assert read_watermark(path) is None
+
+    assert write_watermark(path, datetime(2024, 1, 1, 10))
+    assert not write_watermark(path, datetime(2024, 1, 1, 9))
+    assert not write_watermark(path, datetime(2024, 1, 1, 10))
+    assert read_watermark(path) == datetime(2024, 1, 1, 10)
+    assert write_watermark(path, datetime(2024, 1, 1, 11))
+    assert read_watermark(path) == datetime(2024, 1, 1, 11)
+
+
+def test_overlapping_writers_keep_the_latest_mark(s3_base_path):
+    path = watermark_path(s3_base_path, "Test Region")
+    marks = [datetime(2024, 1, 1) + timedelta(hours=hour) for hour in range(16)]
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(lambda mark: write_watermark(path, mark), marks[::-1]))
+    assert read_watermark(path) == marks[-1]
+
+
+def test_transform_only_merges_hours_past_the_watermark(s3_base_path):
+    times = [datetime(2024, 1, 1) + timedelta(hours=hour) for hour in range(6)]
+    payload = {
+        "hourly": {
+            "time": [time.strftime("%Y-%m-%dT%H:%M") for time in times],
+            "temperature_2m": [20.0, 21.0, 22.0, 23.0, 24.0, None],
+            "windspeed_10m": [1.0] * 6,
+            "relative_humidity_2m": [50.0] * 6,
+        }
+    }
+    raw_path = f"{s3_base_path}/raw/weather_history_Test_20240101_0600.json"
+    write_object(json.dumps(payload).encode("utf-8"), raw_path)
+    state_path = watermark_path(s3_base_path, "Test Region")
+    write_watermark(state_path, times[1])
+
+    orchestrate_weather_transform(
+        {
+            "region": "Test Region",
+            "date": "20240101_0600",
+            "s3_path": raw_path,
+            "watermark": times[1].isoformat(),
+            "watermark_s3_path": state_path,
+        },
+        f"{s3_base_path}/clean",
+    )
+
+    table = clean_layer.table_path(f"{s3_base_path}/clean", "Test Region")
+    rows = clean_layer.read_rows(table, datetime.min, datetime.max)
+    # Hours up to the mark were merged before; the trailing null hour is not
+    # published yet
+    assert rows["time"].to_list() == times[2:5]
+    assert read_watermark(state_path) == times[4]